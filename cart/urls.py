@@ -2,7 +2,6 @@ from django.contrib import admin
 from django.urls import path
 
 from django.conf import settings
-from django.conf.urls.static import static
 
 from django.contrib.auth import views as auth_views
 from zenko import settings
@@ -16,6 +15,3 @@ urlpatterns = [
    # path('update/', views.cart_Update, name = "cart_Update"),
    
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
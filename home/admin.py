@@ -1,7 +1,11 @@
 from django.contrib import admin # type: ignore
+from django.contrib.admin.helpers import ActionForm
 from django import forms
 from django.utils.safestring import mark_safe
-from .models import Product, FeaturedProduct, Logo, Profile, Order, OrderItem, Slider, DeliveryFeature, AboutPage, AboutHighlight, ContactPage, ContactSubmission  # Profile import করা হয়েছে
+from .delivery import add_features_to_page, remove_features_from_page, set_feature_pages
+from .exports import csv_response, xlsx_response
+from .tasks import retry
+from .models import Product, FeaturedProduct, Logo, Profile, Order, OrderItem, ProductVariant, Slider, StockLevel, StockReservation, Task, DeliveryFeature, AboutPage, AboutHighlight, ContactPage, ContactSubmission  # Profile import করা হয়েছে
 
 # --------------------
 # Product Admin
@@ -42,12 +46,76 @@ class ProductAdminForm(forms.ModelForm):
         exclude = ('is_slider',)  # Hide from admin form
 
 
+class StockLevelForm(forms.ModelForm):
+    class Meta:
+        model = StockLevel
+        fields = ('volume_option', 'on_hand')
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.instance.pk:
+            # The current value, not the one loaded with the form: orders may have reserved since
+            self.instance.reserved = StockLevel.objects.filter(pk=self.instance.pk).values_list('reserved', flat=True).first() or 0
+        on_hand = cleaned_data.get('on_hand')
+        if on_hand is not None and on_hand < self.instance.reserved:
+            self.add_error('on_hand', f"Pending orders hold {self.instance.reserved} of this; on hand cannot be lower.")
+        return cleaned_data
+
+
+class StockLevelInline(admin.TabularInline):
+    model = StockLevel
+    form = StockLevelForm
+    extra = 0
+    fields = ('volume_option', 'on_hand', 'reserved')
+    readonly_fields = ('reserved',)
+
+class ProductVariantInline(admin.TabularInline):
+    model = ProductVariant
+    extra = 0
+    fields = ('volume_option', 'price', 'sale_price')
+
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
     form = ProductAdminForm
-    list_display = ('name', 'price', 'is_sale', 'is_popular')  # removed is_slider
+    inlines = [ProductVariantInline, StockLevelInline]
+    list_display = ('name', 'price', 'is_sale', 'discount_percent', 'is_popular')  # removed is_slider
     list_filter = ('is_sale', 'is_popular', 'product_type', 'product_gender')  # removed is_slider
     search_fields = ('name', 'product_type', 'product_gender', 'details')
+    readonly_fields = ('video_renditions',)
+
+    @admin.display(description='Video renditions')
+    def video_renditions(self, obj):
+        if not obj.video:
+            return '—'
+        if not obj.video_ready:
+            return "Processing (see Tasks)"
+        return ', '.join(f.name for f in (obj.video_mp4, obj.video_webm, obj.video_poster) if f)
+
+# --------------------
+# Stock Admin
+# --------------------
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    form = StockLevelForm
+    list_display = ('product', 'volume_option', 'on_hand', 'reserved', 'available')
+    list_editable = ('on_hand',)
+    list_filter = ('volume_option',)
+    search_fields = ('product__name',)
+    list_select_related = ('product',)
+
+    def get_changelist_form(self, request, **kwargs):
+        kwargs.setdefault('form', StockLevelForm)
+        return super().get_changelist_form(request, **kwargs)
+
+class StockReservationInline(admin.TabularInline):
+    model = StockReservation
+    extra = 0
+    can_delete = False
+    fields = ('stock', 'quantity', 'status', 'expires_at')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 # --------------------
 # FeaturedProduct Admin
@@ -103,35 +171,34 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ('order_status', 'created_at', 'user')
     search_fields = ('user__username', 'first_name', 'last_name', 'email')
     ordering = ('-created_at',)
-    inlines = [OrderItemInline]
+    inlines = [OrderItemInline, StockReservationInline]
     fields = (
         'user', 'order_status',
         'first_name', 'last_name', 'email', 'phone', 'address', 'country', 'order_notes',
         'delivery_charge', 'total_price', 'created_at'
     )
     readonly_fields = ('created_at',)
+    date_hierarchy = 'created_at'
+    actions = ['export_csv', 'export_xlsx']
+
+    # Filter by status/date first, then "select all" to export the whole filtered list
+    @admin.action(description="Export selected orders (CSV)")
+    def export_csv(self, request, queryset):
+        return csv_response(queryset)
+
+    @admin.action(description="Export selected orders (Excel)")
+    def export_xlsx(self, request, queryset):
+        try:
+            return xlsx_response(queryset)
+        except ImportError:
+            self.message_user(request, "Excel export needs the 'openpyxl' package; use CSV instead.", level='error')
 
 # --------------------
 # DeliveryFeature Admin
 # --------------------
 class DeliveryFeatureForm(forms.ModelForm):
     BRAND = '#b84592'
-    PAGE_CHOICES = [
-        ('all', 'All pages'),
-        ('home', 'Home'),
-        ('shop', 'Shop'),
-        ('product', 'Product detail'),
-        ('cart', 'Cart'),
-        ('checkout', 'Checkout'),
-        ('category_male', 'Male category'),
-        ('category_female', 'Female category'),
-        ('category_unisex', 'Unisex category'),
-        ('search', 'Search results'),
-        ('about', 'About'),
-        ('contact', 'Contact'),
-        ('profile', 'Profile'),
-        ('thankyou', 'Thank you'),
-    ]
+    PAGE_CHOICES = DeliveryFeature.PAGE_CHOICES
     COLOR_PRESETS = [
         ('', '— Choose preset —'),
         ('brand', 'Brand (#b84592)'),
@@ -188,18 +255,13 @@ class DeliveryFeatureForm(forms.ModelForm):
         )
         self.fields['color_preset'].help_text = mark_safe('Quick presets: ' + ''.join(swatch_html))
 
-        initial_pages = []
-        raw = (self.instance.pages or '') if self.instance and self.instance.pk else ''
-        if raw:
-            initial_pages = [p.strip() for p in raw.split(',') if p.strip()]
-        self.fields['pages'].initial = initial_pages
+        if self.instance and self.instance.pk:
+            self.fields['pages'].initial = self.instance.page_keys
 
     def clean_pages(self):
+        # Nothing selected, or 'all' selected, means every page
         values = self.cleaned_data.get('pages') or []
-        # If 'all' selected, store exactly 'all'
-        if 'all' in values:
-            return 'all'
-        return ','.join(values)
+        return ['all'] if not values or 'all' in values else values
 
     def save(self, commit=True):
         obj = super().save(commit=False)
@@ -211,23 +273,67 @@ class DeliveryFeatureForm(forms.ModelForm):
             obj.icon_color = '#111111'
         elif preset == 'white':
             obj.icon_color = '#ffffff'
-        # pages
-        pages_value = self.cleaned_data.get('pages')
-        if isinstance(pages_value, list):
-            obj.pages = 'all' if 'all' in pages_value else ','.join(pages_value)
         if commit:
             obj.save()
+            self._save_m2m()
+        else:
+            self.save_m2m = self._save_m2m
         return obj
 
+    def _save_m2m(self):
+        super()._save_m2m()
+        # pages are DeliveryFeaturePage rows, written once the feature has a pk
+        set_feature_pages(self.instance, self.cleaned_data['pages'])
+
+
+class DeliveryPageActionForm(ActionForm):
+    page = forms.ChoiceField(choices=DeliveryFeature.PAGE_CHOICES, required=False)
+
 @admin.register(DeliveryFeature)
 class DeliveryFeatureAdmin(admin.ModelAdmin):
     form = DeliveryFeatureForm
-    list_display = ('title', 'icon', 'icon_color', 'icon_size', 'is_active', 'sort_order', 'created_at')
-    list_filter = ('is_active', 'icon')
+    action_form = DeliveryPageActionForm
+    actions = ['add_to_page', 'remove_from_page']
+    list_display = ('title', 'icon', 'icon_color', 'icon_size', 'page_list', 'is_active', 'sort_order', 'created_at')
+    list_filter = ('is_active', 'icon', 'targets__page')
     search_fields = ('title', 'description')
     ordering = ('sort_order', 'id')
     fields = ('title', 'description', 'icon', 'color_preset', 'icon_color', 'icon_size', 'pages', 'is_active', 'sort_order')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).prefetch_related('targets')
+
+    @admin.display(description='Pages')
+    def page_list(self, obj):
+        return ', '.join(obj.page_keys) or '—'
+
+    def _chosen_page(self, request):
+        page = request.POST.get('page')
+        if page not in dict(DeliveryFeature.PAGE_CHOICES):
+            self.message_user(request, "Choose a page first.", level='warning')
+            return None
+        return page
+
+    @admin.action(description="Show selected features on the chosen page")
+    def add_to_page(self, request, queryset):
+        page = self._chosen_page(request)
+        if page:
+            count = add_features_to_page(queryset, page)
+            self.message_user(request, f"{count} feature(s) now shown on '{page}'.")
+
+    @admin.action(description="Remove selected features from the chosen page")
+    def remove_from_page(self, request, queryset):
+        page = self._chosen_page(request)
+        if page:
+            removed, kept = remove_features_from_page(queryset, page)
+            self.message_user(request, f"Removed {removed} page target(s) for '{page}'.")
+            if kept:
+                self.message_user(
+                    request,
+                    f"{kept} feature(s) shown only on '{page}' were kept there; untick 'Is active' to hide them.",
+                    level='warning',
+                )
+
 # --------------------
 # About Page Admin
 # --------------------
@@ -265,6 +371,27 @@ class ContactSubmissionAdmin(admin.ModelAdmin):
     readonly_fields = ("name", "email", "phone", "subject", "message", "created_at")
     ordering = ("-created_at",)
 
+# --------------------
+# Background Task Admin
+# --------------------
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'args', 'status', 'priority', 'attempts', 'max_attempts', 'run_after', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    ordering = ('-id',)
+    actions = ['retry_tasks']
+    fields = ('name', 'args', 'status', 'priority', 'attempts', 'max_attempts', 'run_after', 'worker', 'created_at', 'started_at', 'heartbeat_at', 'finished_at', 'last_error')
+    readonly_fields = ('name', 'args', 'status', 'attempts', 'worker', 'created_at', 'started_at', 'heartbeat_at', 'finished_at', 'last_error')
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description="Run selected tasks again")
+    def retry_tasks(self, request, queryset):
+        count = retry(queryset)
+        self.message_user(request, f"{count} task(s) queued again.")
+
 # --------------------
 # Admin site customization
 # --------------------
@@ -0,0 +1,237 @@
+"""
+Bundled, minified and content-hashed CSS/JS for ``base.html``.
+
+``manage.py build_assets`` concatenates the files of each bundle in
+``BUNDLES`` (rewriting relative ``url(...)``s in CSS so fonts and images
+still resolve from ``bundles/``), minifies them, writes them to
+``ASSET_BUILD_DIR`` as ``bundles/<name>.<hash>.<ext>`` with ``.gz`` and,
+when the ``brotli`` package is installed, ``.br`` siblings, records the
+hashed names in ``bundles/manifest.json`` and runs ``collectstatic``.
+``AssetFinder`` makes that output a static source like ``static/``, so
+``runserver`` serves it too.
+
+``AssetStorage`` (the ``staticfiles`` storage) maps bundle names through
+that manifest, so ``{% static 'bundles/site.css' %}`` gives the hashed URL,
+which ``home.serve`` caches for a year as immutable. ``{% bundle %}`` in
+``site_extras`` falls back to the separate source files until a build exists.
+"""
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import re
+import shutil
+
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.finders import BaseFinder
+from django.contrib.staticfiles.storage import StaticFilesStorage
+from django.contrib.staticfiles.utils import get_files
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage
+from django.utils._os import safe_join
+
+BUNDLE_DIR = 'bundles'
+MANIFEST_NAME = f'{BUNDLE_DIR}/manifest.json'
+HASH_LENGTH = 12
+
+# Bundle name -> source files, in the order base.html loaded them
+BUNDLES = {
+    f'{BUNDLE_DIR}/site.css': (
+        'css/bootstrap.min.css',
+        'css/animate.min.css',
+        'css/owl.carousel.min.css',
+        'css/owl.theme.default.min.css',
+        'css/jquery.fancybox.min.css',
+        'fonts/icomoon/style.css',
+        'fonts/flaticon/font/flaticon.css',
+        'css/aos.css',
+        'css/style.css',
+        'css/responsive-overrides.css',
+    ),
+    f'{BUNDLE_DIR}/site.js': (
+        'js/jquery-3.4.1.min.js',
+        'js/popper.min.js',
+        'js/bootstrap.min.js',
+        'js/owl.carousel.min.js',
+        'js/jquery.animateNumber.min.js',
+        'js/jquery.waypoints.min.js',
+        'js/jquery.fancybox.min.js',
+        'js/jquery.sticky.js',
+        'js/aos.js',
+        'js/custom.js',
+    ),
+}
+
+CSS_URL_RE = re.compile(r'''url\(\s*(['"]?)(.*?)\1\s*\)''')
+CSS_CHARSET_RE = re.compile(r'@charset\s+["\'][^"\']*["\']\s*;', re.I)
+CSS_TOKEN_RE = re.compile(r'''("(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')|(/\*.*?\*/)|(\s+)''', re.S)
+JS_SOURCE_MAP_RE = re.compile(r'^\s*//[#@]\s*sourceMappingURL=.*$', re.M)
+
+
+class AssetError(Exception):
+    pass
+
+
+# ---------------------------
+# Building
+# ---------------------------
+def build_dir():
+    return settings.ASSET_BUILD_DIR
+
+
+def read_source(name):
+    path = finders.find(name)
+    if path is None:
+        raise AssetError(f"Static file '{name}' (listed in BUNDLES) was not found.")
+    with open(path, encoding='utf-8') as source:
+        return source.read()
+
+
+def rebase_css_urls(css, source_name):
+    """Point the relative ``url(...)``s of ``source_name`` at the same files from ``bundles/``."""
+    source_dir = posixpath.dirname(source_name)
+
+    def rebase(match):
+        quote, url = match.groups()
+        if not url or url.startswith(('data:', '/', '#')) or '://' in url:
+            return match.group(0)
+        path, suffix = re.match(r'([^?#]*)(.*)', url).groups()
+        target = posixpath.normpath(posixpath.join(source_dir, path))
+        return f'url({quote}{posixpath.relpath(target, BUNDLE_DIR)}{suffix}{quote})'
+
+    return CSS_URL_RE.sub(rebase, css)
+
+
+def minify_css(css):
+    """Drop comments (bar ``/*! ... */``) and the whitespace CSS does not need; strings are left alone."""
+
+    def replace(match):
+        string, comment, _ = match.groups()
+        if string:
+            return string
+        if comment:
+            return comment if comment.startswith('/*!') else ''
+        before, after = css[match.start() - 1:match.start()], css[match.end():match.end() + 1]
+        if not before or not after or before in '{};,:' or after in '{};,':
+            return ''
+        return ' '
+
+    return CSS_TOKEN_RE.sub(replace, css).strip()
+
+
+def minify_js(js):
+    """Minify with ``rjsmin`` when it is installed; most sources are already minified either way."""
+    js = JS_SOURCE_MAP_RE.sub('', js)
+    try:
+        import rjsmin
+    except ImportError:
+        return js.strip()
+    return rjsmin.jsmin(js, keep_bang_comments=True)
+
+
+def bundle_content(name, sources):
+    if name.endswith('.css'):
+        parts = [minify_css(CSS_CHARSET_RE.sub('', rebase_css_urls(read_source(source), source))) for source in sources]
+        return '\n'.join(parts) + '\n'
+    # Each script ends its own statement, whatever the last line of the file before it was
+    return ';\n'.join(minify_js(read_source(source)) for source in sources) + ';\n'
+
+
+def hashed_name(name, content):
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    root, extension = posixpath.splitext(name)
+    return f'{root}.{digest}{extension}'
+
+
+def compress(path, data):
+    """Write ``.gz`` (and ``.br`` with the ``brotli`` package) next to ``path`` when smaller. Returns the suffixes written."""
+    written = []
+    variants = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+    try:
+        import brotli
+    except ImportError:
+        pass
+    else:
+        variants.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+    for suffix, compressor in variants:
+        packed = compressor(data)
+        if len(packed) < len(data):
+            with open(path + suffix, 'wb') as target:
+                target.write(packed)
+            written.append(suffix)
+    return written
+
+
+def build_bundles():
+    """
+    Write every bundle, its compressed copies and the manifest under
+    ``ASSET_BUILD_DIR``, replacing the previous build. Returns the manifest.
+    """
+    root = os.path.join(build_dir(), BUNDLE_DIR)
+    shutil.rmtree(root, ignore_errors=True)
+    os.makedirs(root)
+
+    manifest = {}
+    for name, sources in BUNDLES.items():
+        content = bundle_content(name, sources).encode('utf-8')
+        hashed = hashed_name(name, content)
+        path = os.path.join(build_dir(), hashed)
+        with open(path, 'wb') as target:
+            target.write(content)
+        compress(path, content)
+        manifest[name] = hashed
+
+    with open(os.path.join(build_dir(), MANIFEST_NAME), 'w') as target:
+        json.dump(manifest, target, indent=2, sort_keys=True)
+    return manifest
+
+
+# ---------------------------
+# Finding and resolving
+# ---------------------------
+class AssetFinder(BaseFinder):
+    """Finds files under ``ASSET_BUILD_DIR``; finds nothing before the first build."""
+
+    def find(self, path, all=False):
+        try:
+            full = safe_join(build_dir(), path)
+        except SuspiciousFileOperation:
+            full = None
+        if full is None or not os.path.isfile(full):
+            return [] if all else None
+        return [full] if all else full
+
+    def list(self, ignore_patterns):
+        if os.path.isdir(build_dir()):
+            storage = FileSystemStorage(location=build_dir())
+            for path in get_files(storage, ignore_patterns):
+                yield path, storage
+
+
+_loaded = {'key': None, 'entries': {}}
+
+
+def load_manifest(path):
+    """Bundle name -> hashed name from ``path``; re-read only when the file changes."""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return {}
+    key = (path, info.st_mtime_ns, info.st_size)
+    if _loaded['key'] != key:
+        with open(path) as source:
+            _loaded['entries'] = json.load(source)
+        _loaded['key'] = key
+    return _loaded['entries']
+
+
+class AssetStorage(StaticFilesStorage):
+    """``StaticFilesStorage`` whose bundle URLs point at the hashed files from the last ``build_assets``."""
+
+    def manifest(self):
+        return load_manifest(self.path(MANIFEST_NAME))
+
+    def url(self, name):
+        return super().url(self.manifest().get(name, name))
@@ -0,0 +1,323 @@
+"""
+Cart storage and reads for the cart and checkout pages.
+
+Signed-in shoppers keep their cart in ``Cart``/``CartItem``. Anonymous
+shoppers keep it in a compact signed cookie, so browsing and filling a cart
+costs no database writes; ``merge_anonymous_cart`` folds it into the
+database cart in one bulk write when they sign in. ``get_cart(request)``
+returns the right backend and both expose the same small interface.
+
+Either way templates get an immutable ``CartSummary``, priced by
+``home.pricing``: the lines are loaded in one query joined to their
+products, plus one query for the products' volume variants.
+
+The header badge (``cart_count``, via the ``home.context_processors.cart``
+context processor) reads a per-user cached quantity sum, dropped by every
+write the database backend makes, and the cookie lines for guests, so it
+costs no queries on a cache hit.
+"""
+import json
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Sum
+
+from .models import Cart, CartItem, Product
+from .pricing import VOLUMES, quote, variants_for
+
+CENTS = Decimal('0.01')
+
+COOKIE_NAME = 'cart'
+COOKIE_SALT = 'home.cart'
+COOKIE_MAX_AGE = 60 * 60 * 24 * 30
+MAX_COOKIE_LINES = 50  # keeps the cookie well under the 4KB browser limit
+
+COUNT_CACHE_KEY = 'home:cart-count:{}'
+COUNT_TIMEOUT = 60 * 60 * 24
+
+
+@dataclass(frozen=True)
+class CartLine:
+    id: int
+    product: object
+    quantity: int
+    volume_option: str
+    unit_price: Decimal
+    total_price: Decimal
+
+
+@dataclass(frozen=True)
+class CartSummary:
+    lines: tuple = ()
+    subtotal: Decimal = Decimal('0.00')
+    item_count: int = 0
+
+    def __iter__(self):
+        return iter(self.lines)
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __bool__(self):
+        return bool(self.lines)
+
+
+EMPTY_CART = CartSummary()
+
+
+def _line(line_id, product, volume_option, quantity, variants):
+    unit_price = quote(product, volume_option, variants).unit_price
+    return CartLine(
+        id=line_id,
+        product=product,
+        quantity=quantity,
+        volume_option=volume_option,
+        unit_price=unit_price,
+        total_price=(unit_price * quantity).quantize(CENTS),
+    )
+
+
+def _summary(lines):
+    lines = tuple(lines)
+    return CartSummary(
+        lines=lines,
+        subtotal=sum((line.total_price for line in lines), Decimal('0.00')),
+        item_count=sum(line.quantity for line in lines),
+    )
+
+
+def _user_items(user):
+    return CartItem.objects.filter(cart__user=user)
+
+
+def cart_summary(user):
+    """Lines, subtotal and item count of ``user``'s cart."""
+    if not user.is_authenticated:
+        return EMPTY_CART
+    items = list(_user_items(user).select_related('product').order_by('id'))
+    variants = variants_for(item.product_id for item in items) if items else {}
+    return _summary(
+        _line(item.id, item.product, item.volume_option, item.quantity, variants)
+        for item in items
+    )
+
+
+def _count_key(user):
+    return COUNT_CACHE_KEY.format(user.pk)
+
+
+def forget_cart_count(user):
+    cache.delete(_count_key(user))
+
+
+def cart_subtotal(user):
+    return cart_summary(user).subtotal
+
+
+# ---------------------------
+# Storage backends
+# ---------------------------
+class DatabaseCartStorage:
+    def __init__(self, user):
+        self.user = user
+
+    def summary(self):
+        summary = cart_summary(self.user)
+        cache.set(_count_key(self.user), summary.item_count, COUNT_TIMEOUT)
+        return summary
+
+    def count(self):
+        key = _count_key(self.user)
+        count = cache.get(key)
+        if count is None:
+            count = _user_items(self.user).aggregate(count=Sum('quantity'))['count'] or 0
+            cache.set(key, count, COUNT_TIMEOUT)
+        return count
+
+    def add(self, product_id, volume_option, quantity):
+        """Add ``quantity`` of a product/volume. Returns False if it did not fit (cookie carts only)."""
+        updated = (
+            _user_items(self.user)
+            .filter(product_id=product_id, volume_option=volume_option)
+            .update(quantity=F('quantity') + quantity)
+        )
+        if not updated:
+            cart, _ = Cart.objects.get_or_create(user=self.user)
+            CartItem.objects.create(cart=cart, product_id=product_id, volume_option=volume_option, quantity=quantity)
+        forget_cart_count(self.user)
+        return True
+
+    def change(self, line_id, delta):
+        """Adjust a line's quantity, deleting it at zero. Returns ``(quantity, line_total)`` or ``None``."""
+        item = _user_items(self.user).select_related('product').filter(pk=line_id).first()
+        if item is None:
+            return None
+        item.quantity += delta
+        forget_cart_count(self.user)
+        if item.quantity < 1:
+            item.delete()
+            return 0, Decimal('0.00')
+        item.save(update_fields=['quantity'])
+        return item.quantity, item.total_price()
+
+    def clear(self):
+        _user_items(self.user).delete()
+        forget_cart_count(self.user)
+
+
+class CookieCartStorage:
+    """
+    Anonymous cart in a signed cookie holding ``[[line_id, product_id,
+    volume_option, quantity], ...]``. Changes are written back to the
+    response by ``CartCookieMiddleware``.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.lines = self._load()
+        self.modified = False
+        request._cart_cookie = self
+
+    def _load(self):
+        try:
+            raw = self.request.get_signed_cookie(COOKIE_NAME, default=None, salt=COOKIE_SALT, max_age=COOKIE_MAX_AGE)
+            lines = json.loads(raw) if raw else []
+            return [
+                [int(line_id), int(pk), str(volume), int(qty)]
+                for line_id, pk, volume, qty in lines
+                if int(qty) > 0 and volume in VOLUMES
+            ]
+        except (signing.BadSignature, ValueError, TypeError):
+            return []
+
+    def _find(self, line_id):
+        for line in self.lines:
+            if line[0] == line_id:
+                return line
+        return None
+
+    def summary(self):
+        if not self.lines:
+            return EMPTY_CART
+        products = Product.objects.in_bulk({line[1] for line in self.lines})
+        variants = variants_for(products)
+        return _summary(
+            _line(line_id, products[pk], volume, qty, variants)
+            for line_id, pk, volume, qty in self.lines
+            if pk in products
+        )
+
+    def count(self):
+        return sum(line[3] for line in self.lines)
+
+    def add(self, product_id, volume_option, quantity):
+        for line in self.lines:
+            if line[1] == product_id and line[2] == volume_option:
+                line[3] += quantity
+                break
+        else:
+            if len(self.lines) >= MAX_COOKIE_LINES:
+                return False
+            next_id = max((line[0] for line in self.lines), default=0) + 1
+            self.lines.append([next_id, product_id, volume_option, quantity])
+        self.modified = True
+        return True
+
+    def change(self, line_id, delta):
+        line = self._find(line_id)
+        if line is None:
+            return None
+        line[3] += delta
+        self.modified = True
+        if line[3] < 1:
+            self.lines.remove(line)
+            return 0, Decimal('0.00')
+        product = Product.objects.filter(pk=line[1]).first()
+        if product is None:
+            return line[3], Decimal('0.00')
+        return line[3], quote(product, line[2]).unit_price * line[3]
+
+    def clear(self):
+        self.lines = []
+        self.modified = True
+
+    def persist(self, response):
+        if not self.modified:
+            return
+        if self.lines:
+            response.set_signed_cookie(
+                COOKIE_NAME, json.dumps(self.lines, separators=(',', ':')), salt=COOKIE_SALT,
+                max_age=COOKIE_MAX_AGE, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(COOKIE_NAME, samesite='Lax')
+
+
+def get_cart(request):
+    """The cart backend for this request (database when signed in, cookie otherwise)."""
+    cart = getattr(request, '_cart_storage', None)
+    if cart is None:
+        if request.user.is_authenticated:
+            cart = DatabaseCartStorage(request.user)
+        else:
+            cart = CookieCartStorage(request)
+        request._cart_storage = cart
+    return cart
+
+
+def cart_count(request):
+    """Total quantity in this request's cart, for the header badge."""
+    return get_cart(request).count()
+
+
+def merge_anonymous_cart(request, user):
+    """Fold the anonymous cookie cart into ``user``'s database cart with one bulk write each way."""
+    anonymous = getattr(request, '_cart_cookie', None) or CookieCartStorage(request)
+    request._cart_storage = None
+    if not anonymous.lines:
+        return
+
+    wanted = {}
+    for _, pk, volume, qty in anonymous.lines:
+        wanted[(pk, volume)] = wanted.get((pk, volume), 0) + qty
+    known = set(Product.objects.filter(pk__in={pk for pk, _ in wanted}).values_list('pk', flat=True))
+
+    with transaction.atomic():
+        cart, _ = Cart.objects.get_or_create(user=user)
+        current = {
+            (item.product_id, item.volume_option): item
+            for item in cart.items.filter(product_id__in=known)
+        }
+        to_create, to_update = [], []
+        for (pk, volume), qty in wanted.items():
+            if pk not in known:
+                continue
+            item = current.get((pk, volume))
+            if item is None:
+                to_create.append(CartItem(cart=cart, product_id=pk, volume_option=volume, quantity=qty))
+            else:
+                item.quantity += qty
+                to_update.append(item)
+        CartItem.objects.bulk_create(to_create)
+        CartItem.objects.bulk_update(to_update, ['quantity'])
+    forget_cart_count(user)
+    anonymous.clear()
+
+
+class CartCookieMiddleware:
+    """Write back (or delete) the anonymous cart cookie when a view changed it."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        cookie_cart = getattr(request, '_cart_cookie', None)
+        if cookie_cart is not None:
+            cookie_cart.persist(response)
+        return response
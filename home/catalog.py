@@ -0,0 +1,137 @@
+"""
+Catalog listing engine shared by the shop, category and search views.
+
+Every listing page is described by a set of declarative filters plus a
+sort key; ``product_listing`` turns that into one queryset that loads only
+the columns the listing templates render.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+
+from .models import Product
+from .search import get_search_backend
+
+
+# Columns used by shop.html, search.html, the category templates and popularItems.html
+LISTING_FIELDS = (
+    'id', 'name', 'product_gender', 'product_type',
+    'price', 'sale_price', 'is_sale', 'is_popular', 'new_product', 'image1',
+)
+
+DEFAULT_SORT = 'new'
+
+POPULAR_ITEMS_CACHE_KEY = 'home:popular-items'
+POPULAR_ITEMS_TIMEOUT = 60 * 15
+
+
+# ---------------------------
+# Sort strategies
+# ---------------------------
+SORTS = {
+    'new': lambda qs: qs.order_by('-id'),
+    # Search results in backend rank order; plain listings have no rank, so newest first
+    'relevance': lambda qs: qs.order_by('-id'),
+    'price_asc': lambda qs: qs.order_by('price', 'id'),
+    'price_desc': lambda qs: qs.order_by('-price', '-id'),
+    'name_az': lambda qs: qs.order_by('name', 'id'),
+    'name_za': lambda qs: qs.order_by('-name', '-id'),
+    # Counters maintained by home/sales.py, so these are plain indexed orderings
+    'popular': lambda qs: qs.order_by('-units_sold', '-id'),
+    'trending': lambda qs: qs.order_by('-units_sold_30d', '-id'),
+    # discount_percent is a stored generated column covered by product_sale_discount_idx
+    'sale': lambda qs: qs.filter(is_sale=True).order_by('-discount_percent', '-id'),
+}
+
+
+def normalize_sort(sort):
+    return sort if sort in SORTS else DEFAULT_SORT
+
+
+# ---------------------------
+# Filters
+# ---------------------------
+def _to_decimal(value):
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def product_listing(sort=DEFAULT_SORT, gender=None, product_type=None, sale=None,
+                    new=None, min_price=None, max_price=None, search=None):
+    """
+    Build the queryset for a catalog listing.
+
+    All filters are optional; ``None`` means "don't filter on this".
+    ``product_type`` is matched case-insensitively as a substring (so
+    ``"roll"`` matches "Roll Ons"), ``search`` goes through the configured
+    search backend, everything else is an exact match.
+    """
+    qs = Product.objects.only(*LISTING_FIELDS)
+
+    if gender:
+        qs = qs.filter(product_gender=gender)
+    if product_type:
+        qs = qs.filter(product_type__icontains=product_type)
+    if sale is not None:
+        qs = qs.filter(is_sale=sale)
+    if new is not None:
+        qs = qs.filter(new_product=new)
+    min_price = _to_decimal(min_price)
+    if min_price is not None:
+        qs = qs.filter(price__gte=min_price)
+    max_price = _to_decimal(max_price)
+    if max_price is not None:
+        qs = qs.filter(price__lte=max_price)
+    sort = normalize_sort(sort)
+    if search:
+        if sort == 'relevance':
+            return get_search_backend().search(qs, search, ranked=True)
+        qs = get_search_backend().search(qs, search)
+
+    return SORTS[sort](qs)
+
+
+def listing_page(request, per_page, default_sort=DEFAULT_SORT, **filters):
+    """
+    Resolve ``?sort=``, ``?page=`` and the optional ``?min_price=`` /
+    ``?max_price=`` query params for a listing view.
+
+    Returns ``(sort, page)`` ready to drop into the template context.
+    """
+    sort = normalize_sort(request.GET.get('sort', default_sort))
+    filters.setdefault('min_price', request.GET.get('min_price'))
+    filters.setdefault('max_price', request.GET.get('max_price'))
+    qs = product_listing(sort=sort, **filters)
+    paginator = Paginator(qs, per_page)
+    return sort, paginator.get_page(request.GET.get('page'))
+
+
+# ---------------------------
+# Popular items feed
+# ---------------------------
+def build_popular_items(limit):
+    """Up to ``limit`` products flagged ``is_popular``, best-selling (then newest) first."""
+    return list(
+        Product.objects.only(*LISTING_FIELDS)
+        .filter(is_popular=True)
+        .order_by('-units_sold', '-id')[:limit]
+    )
+
+
+def popular_items():
+    """The cached popular-items feed; rebuilt after a product changes or every 15 minutes."""
+    items = cache.get(POPULAR_ITEMS_CACHE_KEY)
+    if items is None:
+        items = build_popular_items(getattr(settings, 'POPULAR_ITEMS_LIMIT', 12))
+        cache.set(POPULAR_ITEMS_CACHE_KEY, items, POPULAR_ITEMS_TIMEOUT)
+    return items
+
+
+def invalidate_popular_items():
+    cache.delete(POPULAR_ITEMS_CACHE_KEY)
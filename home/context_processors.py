@@ -0,0 +1,6 @@
+from .cart import cart_count
+
+
+def cart(request):
+    """``cart_items_count`` for the header badge in base.html."""
+    return {'cart_items_count': cart_count(request)}
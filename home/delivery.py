@@ -0,0 +1,120 @@
+"""
+Resolved delivery-feature targeting, shared by the ``delivery_section`` tag
+and the about page.
+
+Targeting lives in ``DeliveryFeaturePage`` rows (``page='all'`` for every
+page). Active features are grouped into page key -> ordered feature list once
+and cached until a feature or its targets change, so rendering the section
+is a single cache read. The ``*_pages`` helpers below are the only writers of
+targets and invalidate the cache themselves, since ``bulk_create`` sends no
+signals.
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from .fragments import invalidate_fragments_for
+from .models import DeliveryFeature, DeliveryFeaturePage
+
+FEATURES_CACHE_KEY = 'home:delivery-features'
+
+# Pseudo page keys in the cached mapping
+ALL_FEATURES = '*'       # every active feature (page_key 'all' or blank)
+UNTARGETED = '__any__'   # features shown on every page, for keys not in PAGE_CHOICES
+
+
+def build_feature_map():
+    features = list(
+        DeliveryFeature.objects.filter(is_active=True)
+        .prefetch_related('targets')
+        .order_by('sort_order', 'id')
+    )
+    page_keys = [key for key, _ in DeliveryFeature.PAGE_CHOICES if key != 'all']
+    mapping = {key: [] for key in page_keys + [UNTARGETED]}
+    mapping[ALL_FEATURES] = features
+    for feature in features:
+        tokens = feature.page_keys
+        if 'all' in tokens:
+            targets = list(mapping.keys())
+            targets.remove(ALL_FEATURES)
+        else:
+            targets = tokens
+        for key in targets:
+            mapping.setdefault(key, []).append(feature)
+    return mapping
+
+
+def features_for_page(page_key):
+    mapping = cache.get(FEATURES_CACHE_KEY)
+    if mapping is None:
+        mapping = build_feature_map()
+        cache.set(FEATURES_CACHE_KEY, mapping, None)
+
+    key = str(page_key or '').lower().strip()
+    if not key or key == 'all':
+        return mapping[ALL_FEATURES]
+    return mapping.get(key, mapping[UNTARGETED])
+
+
+def invalidate_feature_map():
+    cache.delete(FEATURES_CACHE_KEY)
+
+
+def _targets_changed():
+    invalidate_feature_map()
+    invalidate_fragments_for(DeliveryFeature)
+
+
+def normalize_pages(pages):
+    """Drop duplicates and collapse any selection containing 'all' (or nothing) to ``['all']``."""
+    keys = []
+    for page in pages or []:
+        if page and page not in keys:
+            keys.append(page)
+    if not keys or 'all' in keys:
+        return ['all']
+    return keys
+
+
+def set_feature_pages(feature, pages):
+    """Replace ``feature``'s targets with ``pages``."""
+    keys = normalize_pages(pages)
+    with transaction.atomic():
+        feature.targets.exclude(page__in=keys).delete()
+        DeliveryFeaturePage.objects.bulk_create(
+            [DeliveryFeaturePage(feature=feature, page=key) for key in keys],
+            ignore_conflicts=True,
+        )
+    _targets_changed()
+
+
+def add_features_to_page(features, page):
+    """Target every feature in ``features`` (a queryset) at ``page`` as well. Returns the number of features."""
+    ids = list(features.values_list('pk', flat=True))
+    with transaction.atomic():
+        if page == 'all':
+            DeliveryFeaturePage.objects.filter(feature_id__in=ids).exclude(page='all').delete()
+        DeliveryFeaturePage.objects.bulk_create(
+            [DeliveryFeaturePage(feature_id=pk, page=page) for pk in ids],
+            ignore_conflicts=True,
+        )
+    _targets_changed()
+    return len(ids)
+
+
+def remove_features_from_page(features, page):
+    """
+    Stop showing ``features`` on ``page``. A feature targeted only at ``page``
+    keeps it, since no targets would read as every page in the admin form.
+    Returns ``(targets removed, features kept on page)``.
+    """
+    with transaction.atomic():
+        targets = DeliveryFeaturePage.objects.filter(feature__in=features, page=page)
+        targeted = set(targets.values_list('feature_id', flat=True))
+        elsewhere = set(
+            DeliveryFeaturePage.objects.filter(feature_id__in=targeted)
+            .exclude(page=page)
+            .values_list('feature_id', flat=True)
+        )
+        removed, _ = targets.filter(feature_id__in=elsewhere).delete()
+    _targets_changed()
+    return removed, len(targeted - elsewhere)
@@ -0,0 +1,124 @@
+"""
+Order exports for staff: one row per order line, as CSV or XLSX.
+
+Rows come from a single ordered query over orders left-joined to their
+lines and products, read with ``.iterator(chunk_size=...)`` so only one
+chunk is in memory at a time. CSV is streamed straight into a
+``StreamingHttpResponse`` (or a file, from ``manage.py export_orders``);
+XLSX goes through openpyxl's write-only workbook into a temporary file.
+Either way memory stays flat however many orders are exported.
+"""
+import csv
+import tempfile
+
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Order
+
+CHUNK_SIZE = 2000
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+COLUMNS = (
+    ('Order', 'id'),
+    ('Placed', 'created_at'),
+    ('Status', 'order_status'),
+    ('Customer', 'user__username'),
+    ('First name', 'first_name'),
+    ('Last name', 'last_name'),
+    ('Phone', 'phone'),
+    ('Email', 'email'),
+    ('Address', 'address'),
+    ('Area', 'country'),
+    ('Delivery', 'delivery_charge'),
+    ('Order total', 'total_price'),
+    ('Product', 'items__product__name'),
+    ('Volume', 'items__volume_option'),
+    ('Quantity', 'items__quantity'),
+    ('Unit price', 'items__price'),
+)
+HEADER = [label for label, _ in COLUMNS]
+
+
+def filter_orders(orders=None, status=None, since=None, until=None):
+    """Narrow ``orders`` (all orders by default) by status and an inclusive ``created_at`` date range."""
+    orders = Order.objects.all() if orders is None else orders
+    if status:
+        orders = orders.filter(order_status=status)
+    if since:
+        orders = orders.filter(created_at__date__gte=since)
+    if until:
+        orders = orders.filter(created_at__date__lte=until)
+    return orders
+
+
+def export_rows(orders):
+    """One tuple per order line (orders without lines get one row with blank line columns)."""
+    rows = (
+        orders.order_by('id', 'items__id')
+        .values_list(*[field for _, field in COLUMNS])
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+    for row in rows:
+        placed = row[1]
+        yield (row[0], timezone.localtime(placed).strftime('%Y-%m-%d %H:%M') if placed else '') + row[2:]
+
+
+class _Echo:
+    """File-like object whose ``write`` hands the row back instead of storing it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(orders):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(HEADER)
+    for row in export_rows(orders):
+        yield writer.writerow(row)
+
+
+def write_csv(orders, stream):
+    writer = csv.writer(stream)
+    writer.writerow(HEADER)
+    count = 0
+    for row in export_rows(orders):
+        writer.writerow(row)
+        count += 1
+    return count
+
+
+def write_xlsx(orders, target):
+    """Write the export as XLSX to ``target`` (a path or binary file). Needs openpyxl."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Orders')
+    sheet.append(HEADER)
+    count = 0
+    for row in export_rows(orders):
+        sheet.append(row)
+        count += 1
+    workbook.save(target)
+    return count
+
+
+def export_filename(extension):
+    return f"orders-{timezone.localdate():%Y%m%d}.{extension}"
+
+
+def csv_response(orders):
+    response = StreamingHttpResponse(csv_lines(orders), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{export_filename("csv")}"'
+    return response
+
+
+def xlsx_response(orders):
+    target = tempfile.TemporaryFile()
+    try:
+        write_xlsx(orders, target)
+    except BaseException:
+        target.close()
+        raise
+    target.seek(0)
+    return FileResponse(target, as_attachment=True, filename=export_filename('xlsx'), content_type=XLSX_CONTENT_TYPE)
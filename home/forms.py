@@ -26,4 +26,5 @@ class CheckoutForm(forms.Form):
     address = forms.CharField(max_length=255, required=True)
     email = forms.EmailField(required=True)
     phone = forms.CharField(max_length=20, required=True)
-    order_notes = forms.CharField(widget=forms.Textarea, required=False)
\ No newline at end of file
+    order_notes = forms.CharField(widget=forms.Textarea, required=False)
+    checkout_token = forms.UUIDField(widget=forms.HiddenInput, required=False)
\ No newline at end of file
@@ -0,0 +1,41 @@
+"""
+Template fragment cache for the homepage.
+
+``index.html`` wraps the slider, featured products, popular items and the
+delivery section in ``{% cache fragment_timeout <name> [vary_on] %}``. The
+content only changes when staff edit it in admin, so fragments are cached
+for a day and deleted from ``post_save``/``post_delete`` signals on the
+models they render (see ``FRAGMENTS``).
+"""
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+
+from .models import DeliveryFeature, DeliveryFeaturePage, FeaturedProduct, Product, Slider
+
+FRAGMENT_TIMEOUT = 60 * 60 * 24
+
+# fragment name -> (models it renders, every vary_on tuple it is cached under)
+FRAGMENTS = {
+    'home_slider': ((Slider,), [()]),
+    'home_featured': ((FeaturedProduct, Product), [()]),
+    'home_popular_items': ((Product,), [()]),
+    'delivery_section': ((DeliveryFeature, DeliveryFeaturePage), [(key,) for key, _ in DeliveryFeature.PAGE_CHOICES]),
+}
+
+
+def fragment_models():
+    models = []
+    for fragment_models_, _ in FRAGMENTS.values():
+        for model in fragment_models_:
+            if model not in models:
+                models.append(model)
+    return models
+
+
+def invalidate_fragments_for(model):
+    keys = []
+    for name, (models, variants) in FRAGMENTS.items():
+        if model in models:
+            keys.extend(make_template_fragment_key(name, vary_on) for vary_on in variants)
+    if keys:
+        cache.delete_many(keys)
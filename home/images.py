@@ -0,0 +1,206 @@
+"""
+Fixed-width image derivatives for product, slider, logo and page uploads.
+
+When one of the image fields in ``IMAGE_FIELDS`` gets a new file, a
+``build_derivatives`` task is queued (see ``home.tasks``) and the worker
+renders it with Pillow at every width in ``WIDTHS`` as WebP and as JPEG
+(flattened on white) next to the media, under ``derivatives/``. Names are derived from the
+original's name, so nothing extra is stored on the model. Originals are never
+upscaled: a width larger than the original is rendered at the original's
+width, and ``srcset`` lists each real width once. The
+``{% picture %}`` tag in ``site_extras`` turns them into a ``<picture>`` with
+``srcset``; images without derivatives yet (uploaded before this existed,
+until ``manage.py build_image_derivatives`` runs) fall back to the original.
+Pages cached while an image had no derivatives are dropped once they exist.
+"""
+import io
+import logging
+import os
+
+from django.apps import apps
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from .catalog import invalidate_popular_items
+from .fragments import invalidate_fragments_for
+from .thumbnails import invalidate_pools
+
+logger = logging.getLogger(__name__)
+
+# Largest first: each width is resized from the one before it
+WIDTHS = {
+    'zoom': 1600,
+    'detail': 800,
+    'card': 400,
+    'thumb': 120,
+}
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# ``sizes`` attribute used when a template does not pass one
+DEFAULT_SIZES = {
+    'zoom': '100vw',
+    'detail': '(max-width: 991px) 100vw, 800px',
+    'card': '(max-width: 575px) 100vw, (max-width: 991px) 50vw, 400px',
+    'thumb': '120px',
+}
+DERIVATIVE_DIR = 'derivatives'
+READY_CACHE_KEY = 'home:image-derivative-width:{}'
+READY_TIMEOUT = 60 * 60 * 24
+PENDING_TIMEOUT = 60  # recheck soon: the worker may be rendering it right now
+
+IMAGE_FIELDS = {
+    'Product': ('image1', 'image2', 'image3', 'image4', 'image5', 'image6', 'video_poster'),
+    'Slider': ('image',),
+    'Logo': ('image',),
+    'AboutPage': ('image',),
+    'ContactPage': ('hero_image',),
+}
+
+
+def _name(image):
+    """Storage name of a ``FieldFile`` or plain name string."""
+    return str(getattr(image, 'name', image) or '')
+
+
+def derivative_name(image, size, extension):
+    stem, _ = os.path.splitext(_name(image))
+    return f"{DERIVATIVE_DIR}/{stem}-{size}.{extension}"
+
+
+def derivative_url(image, size, extension='jpg'):
+    return default_storage.url(derivative_name(image, size, extension))
+
+
+def original_url(image):
+    return image.url if hasattr(image, 'url') else default_storage.url(_name(image))
+
+
+def derivative_widths(image):
+    """``(size, width)`` for each distinct rendered width, smallest first (larger sizes repeat the original)."""
+    largest = rendered_width(image)
+    widths = []
+    for size, width in reversed(WIDTHS.items()):
+        widths.append((size, min(width, largest)))
+        if width >= largest:
+            break
+    return widths
+
+
+def srcset(image, extension):
+    return ', '.join(f"{derivative_url(image, size, extension)} {width}w" for size, width in derivative_widths(image))
+
+
+def _ready_key(name):
+    return READY_CACHE_KEY.format(name)
+
+
+def _stored_width(name):
+    """Width of the rendered ``zoom`` derivative, or 0 if the set is not complete."""
+    if not default_storage.exists(derivative_name(name, 'thumb', 'jpg')):
+        return 0
+    try:
+        with default_storage.open(derivative_name(name, 'zoom', 'jpg'), 'rb') as rendered:
+            return Image.open(rendered).width  # reads the header only
+    except (OSError, ValueError):
+        return 0
+
+
+def rendered_width(image):
+    """
+    Width of ``image``'s largest derivative (the original's, capped at the
+    ``zoom`` width), or 0 if it has not been rendered; cached so templates
+    rarely touch storage.
+    """
+    name = _name(image)
+    if not name:
+        return 0
+    width = cache.get(_ready_key(name))
+    if width is None:
+        width = _stored_width(name)
+        cache.set(_ready_key(name), width, READY_TIMEOUT if width else PENDING_TIMEOUT)
+    return width
+
+
+def has_derivatives(image):
+    return bool(rendered_width(image))
+
+
+def _flatten(image):
+    if image.mode == 'RGB':
+        return image
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def _store(image, name, fmt, options):
+    buffer = io.BytesIO()
+    image.save(buffer, fmt, **options)
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def generate_derivatives(image):
+    """Render every width and format of ``image``. Returns False if it could not be read."""
+    name = _name(image)
+    try:
+        with default_storage.open(name, 'rb') as original:
+            picture = Image.open(original)
+            picture.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as exc:
+        logger.warning("Could not read image %s for derivatives: %s", name, exc)
+        return False
+
+    picture = ImageOps.exif_transpose(picture)
+    has_alpha = picture.mode in ('RGBA', 'LA') or 'transparency' in picture.info
+    picture = picture.convert('RGBA' if has_alpha else 'RGB')
+
+    largest = None
+    for size, width in WIDTHS.items():
+        if picture.width > width:
+            picture = picture.resize((width, max(1, round(picture.height * width / picture.width))), Image.LANCZOS)
+        largest = largest or picture.width
+        for extension, (fmt, options) in FORMATS.items():
+            rendered = picture if fmt == 'WEBP' else _flatten(picture)
+            _store(rendered, derivative_name(name, size, extension), fmt, options)
+
+    cache.set(_ready_key(name), largest, READY_TIMEOUT)
+    return True
+
+
+def image_fields(instance):
+    return [getattr(instance, field) for field in IMAGE_FIELDS.get(type(instance).__name__, ())]
+
+
+def needs_derivatives(instance):
+    return any(image and not has_derivatives(image) for image in image_fields(instance))
+
+
+def ensure_derivatives(instance, force=False):
+    """Render derivatives for each of ``instance``'s images that lacks them. Returns how many were rendered."""
+    rendered = 0
+    for image in image_fields(instance):
+        if image and (force or not has_derivatives(image)):
+            rendered += generate_derivatives(image)
+    return rendered
+
+
+def refresh_cached_pages(model):
+    """Drop cached HTML and listings that rendered ``model``'s images, so they pick up new derivatives."""
+    invalidate_fragments_for(model)
+    if model.__name__ == 'Product':
+        invalidate_popular_items()
+        invalidate_pools()
+
+
+def build_derivatives(model_name, pk, force=False):
+    """Task: render the derivatives of one ``home`` model instance's images."""
+    model = apps.get_model('home', model_name)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is not None and ensure_derivatives(instance, force=force):
+        refresh_cached_pages(model)
@@ -0,0 +1,22 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from home.assets import AssetError, build_bundles
+
+
+class Command(BaseCommand):
+    help = "Bundle, minify, hash and pre-compress the site CSS/JS, then collectstatic (see home/assets.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--no-collect', action='store_true', help="Only build the bundles; skip collectstatic.")
+
+    def handle(self, *args, **options):
+        try:
+            manifest = build_bundles()
+        except AssetError as exc:
+            raise CommandError(str(exc))
+        for name, hashed in manifest.items():
+            self.stdout.write(f"{name} -> {hashed}")
+        if not options['no_collect']:
+            call_command('collectstatic', interactive=False, verbosity=0)
+        self.stdout.write(self.style.SUCCESS(f"Built {len(manifest)} bundle(s)."))
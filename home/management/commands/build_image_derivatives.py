@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from home.images import IMAGE_FIELDS, ensure_derivatives, refresh_cached_pages
+
+
+class Command(BaseCommand):
+    help = "Render the WebP/JPEG image derivatives for every image that lacks them (the worker does new uploads)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Re-render derivatives that already exist.")
+
+    def handle(self, *args, **options):
+        rendered = 0
+        for model_name, fields in IMAGE_FIELDS.items():
+            model = apps.get_model('home', model_name)
+            rendered_for_model = 0
+            for instance in model.objects.only('pk', *fields).iterator(chunk_size=500):
+                rendered_for_model += ensure_derivatives(instance, force=options['force'])
+            if rendered_for_model:
+                refresh_cached_pages(model)
+            rendered += rendered_for_model
+        self.stdout.write(self.style.SUCCESS(f"Rendered derivatives for {rendered} image(s)."))
@@ -0,0 +1,122 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from home.catalog import SORTS, product_listing
+from home.models import Order, Product
+from home.search import get_search_backend
+
+GENDERS = ('Male', 'Female', 'Unisex')
+TYPES = ('Spray perfume', 'Roll Ons')
+NAME_WORDS = ('Velvet', 'Midnight', 'Golden', 'Wild', 'Royal', 'Silk', 'Ocean', 'Desert', 'Crystal', 'Noir')
+NOTES = ('Oud', 'Amber', 'Rose', 'Vetiver', 'Musk', 'Jasmine', 'Sandalwood', 'Citrus', 'Vanilla', 'Leather', 'Iris', 'Tobacco')
+SEARCH_TERM = 'velvet oud'
+WATCHED_TABLES = (Product._meta.db_table, Order._meta.db_table)
+
+
+class _Rollback(Exception):
+    pass
+
+
+def representative_queries(user):
+    """The queries the listing and profile views issue, as (label, queryset) pairs."""
+    queries = []
+    for sort in SORTS:
+        queries.append((f"shop ?sort={sort}", product_listing(sort=sort)[:6]))
+        for gender in GENDERS:
+            queries.append((f"{gender.lower()} ?sort={sort}", product_listing(sort=sort, gender=gender)[:6]))
+    queries.append(("search ?sort=relevance", product_listing(sort='relevance', search=SEARCH_TERM)[:12]))
+    queries.append(("search ?sort=price_asc", product_listing(sort='price_asc', search=SEARCH_TERM)[:12]))
+    queries.append(("popular items", Product.objects.filter(is_popular=True).order_by('-id')[:8]))
+    queries.append(("new arrivals", Product.objects.filter(new_product=True).order_by('-id')[:8]))
+    queries.append(("profile orders", Order.objects.filter(user=user).order_by('-created_at')[:10]))
+    return queries
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a large throwaway catalog inside a transaction, EXPLAIN every listing/profile query "
+        "and fail if any of them sequentially scans the product or order table. PostgreSQL only."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=20000, help="Products to seed (default 20000).")
+        parser.add_argument('--orders', type=int, default=20000, help="Orders to seed (default 20000).")
+        parser.add_argument('--users', type=int, default=200, help="Users the seeded orders are spread over (default 200).")
+        parser.add_argument('--verbose-plans', action='store_true', help="Print every plan, not just the failing ones.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("check_query_plans needs PostgreSQL; the SQLite planner is not representative.")
+
+        failures = []
+        try:
+            with transaction.atomic():
+                user = self._seed(options['products'], options['orders'], options['users'])
+                with connection.cursor() as cursor:
+                    cursor.execute(f'ANALYZE {", ".join(WATCHED_TABLES)}')
+
+                for label, qs in representative_queries(user):
+                    plan = qs.explain()
+                    seq_scans = [
+                        line.strip() for line in plan.splitlines()
+                        if 'Seq Scan' in line and any(table in line for table in WATCHED_TABLES)
+                    ]
+                    if seq_scans:
+                        failures.append(label)
+                        self.stdout.write(self.style.ERROR(f"SEQ SCAN  {label}"))
+                        self.stdout.write(plan)
+                    else:
+                        self.stdout.write(f"ok        {label}")
+                        if options['verbose_plans']:
+                            self.stdout.write(plan)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        if failures:
+            raise CommandError(f"{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} fell back to a sequential scan.")
+        self.stdout.write(self.style.SUCCESS("All catalog queries use an index."))
+
+    def _seed(self, product_count, order_count, user_count):
+        rng = random.Random(42)
+        Product.objects.bulk_create([
+            Product(
+                name=f"{rng.choice(NAME_WORDS)} {rng.choice(NOTES)} {i:06d}",
+                top_note=rng.choice(NOTES),
+                base_note=rng.choice(NOTES),
+                product_type=rng.choice(TYPES),
+                product_gender=rng.choice(GENDERS),
+                price=rng.randint(500, 9000),
+                sale_price=rng.randint(300, 500),
+                is_sale=rng.random() < 0.1,
+                is_popular=rng.random() < 0.02,
+                new_product=rng.random() < 0.02,
+                units_sold=rng.randint(0, 5000),
+                units_sold_30d=rng.randint(0, 200),
+            )
+            for i in range(product_count)
+        ], batch_size=2000)
+        get_search_backend().rebuild()
+
+        User = get_user_model()
+        users = User.objects.bulk_create([
+            User(username=f"plan_check_{i}") for i in range(max(user_count, 1))
+        ])
+        now = timezone.now()
+        orders = Order.objects.bulk_create([
+            Order(
+                user=rng.choice(users), country='inside_dhaka', first_name='Plan', last_name='Check',
+                address='-', email='plan@example.com', phone='0',
+            )
+            for _ in range(order_count)
+        ], batch_size=2000)
+        # created_at is auto_now_add, so spread the history out afterwards
+        for order in orders:
+            order.created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        Order.objects.bulk_update(orders, ['created_at'], batch_size=2000)
+        return users[0]
@@ -0,0 +1,48 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.exports import filter_orders, write_csv, write_xlsx
+from home.models import Order
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Export orders and their lines as CSV or XLSX, one row per line. Memory use does not grow with the export size."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--status', choices=[key for key, _ in Order.ORDER_STATUS_CHOICES], help="Only orders with this status.")
+        parser.add_argument('--since', help="Only orders placed on or after this date (YYYY-MM-DD).")
+        parser.add_argument('--until', help="Only orders placed on or before this date (YYYY-MM-DD).")
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv')
+        parser.add_argument('--output', '-o', help="File to write (CSV goes to stdout when omitted).")
+
+    def handle(self, *args, **options):
+        orders = filter_orders(
+            status=options['status'],
+            since=_date(options['since']) if options['since'] else None,
+            until=_date(options['until']) if options['until'] else None,
+        )
+        output = options['output']
+
+        if options['format'] == 'xlsx':
+            if not output:
+                raise CommandError("--output is required for XLSX exports.")
+            try:
+                rows = write_xlsx(orders, output)
+            except ImportError:
+                raise CommandError("XLSX export needs the 'openpyxl' package.")
+        elif output:
+            with open(output, 'w', newline='', encoding='utf-8') as stream:
+                rows = write_csv(orders, stream)
+        else:
+            rows = write_csv(orders, self.stdout)
+
+        if output:
+            self.stdout.write(self.style.SUCCESS(f"Exported {rows} row(s) to {output}."))
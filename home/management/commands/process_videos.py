@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from home.models import Product
+from home.video import VideoProcessingError, process_product_video
+
+
+class Command(BaseCommand):
+    help = "Transcode product videos to web renditions with a poster frame, without the worker. Needs ffmpeg."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product', type=int, action='append', help="Only this product id (repeatable).")
+        parser.add_argument('--force', action='store_true', help="Redo videos that already have renditions.")
+
+    def handle(self, *args, **options):
+        products = Product.objects.exclude(video='').exclude(video__isnull=True)
+        if options['product']:
+            products = products.filter(pk__in=options['product'])
+        processed = 0
+        for pk in products.values_list('pk', flat=True).iterator():
+            try:
+                processed += process_product_video(pk, force=options['force'])
+            except VideoProcessingError as exc:
+                raise CommandError(f"Product {pk}: {exc}")
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} video(s)."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from home.sales import rebuild_sales_ranks
+
+
+class Command(BaseCommand):
+    help = "Recompute Product.units_sold / units_sold_30d from the order history. Run daily to age out the 30-day counter."
+
+    def handle(self, *args, **options):
+        updated = rebuild_sales_ranks()
+        self.stdout.write(self.style.SUCCESS(f"Sales ranks rebuilt ({updated} products changed)."))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from home.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Recompute Product.search_vector for every product (no-op on backends without an index)."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        updated = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"{type(backend).__name__}: {updated} products reindexed."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from home.stock import release_expired_reservations
+
+
+class Command(BaseCommand):
+    help = "Put back the stock held by expired reservations; the orders stay pending. Run from cron (e.g. hourly)."
+
+    def handle(self, *args, **options):
+        released = release_expired_reservations()
+        self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation(s)."))
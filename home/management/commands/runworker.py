@@ -0,0 +1,39 @@
+import os
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from home.tasks import cache_is_shared, run_worker
+
+
+class Command(BaseCommand):
+    help = "Run queued background tasks (image derivatives, media processing) in a process pool. Keep one running under a process supervisor."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=min(4, os.cpu_count() or 1), help="Pool size (default: CPUs, at most 4).")
+        parser.add_argument('--poll-interval', type=float, default=2.0, help="Seconds between queue checks when idle.")
+        parser.add_argument('--burst', action='store_true', help="Exit once no task is due instead of waiting for more.")
+
+    def handle(self, *args, **options):
+        if not cache_is_shared():
+            raise CommandError(
+                "The default cache is local to each process, so cache invalidation done by tasks "
+                "would never reach the web processes. Set REDIS_URL or CACHE_DIR (zenko/settings.py)."
+            )
+        stopping = []
+
+        def request_stop(signum, frame):
+            self.stdout.write("Finishing running tasks, then stopping...")
+            stopping.append(signum)
+
+        signal.signal(signal.SIGTERM, request_stop)
+        signal.signal(signal.SIGINT, request_stop)
+
+        self.stdout.write(f"Worker started with {options['processes']} process(es).")
+        run_worker(
+            processes=options['processes'],
+            poll_interval=options['poll_interval'],
+            burst=options['burst'],
+            stop=lambda: bool(stopping),
+        )
+        self.stdout.write(self.style.SUCCESS("Worker stopped."))
@@ -0,0 +1,51 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:25
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+
+def backfill_units_sold(apps, schema_editor):
+    Product = apps.get_model('home', 'Product')
+    OrderItem = apps.get_model('home', 'OrderItem')
+    since = timezone.now() - timedelta(days=30)
+    sold = (
+        OrderItem.objects.exclude(order__order_status='cancelled')
+        .values('product_id')
+        .annotate(total=Sum('quantity'), recent=Sum('quantity', filter=Q(order__created_at__gte=since)))
+    )
+    for row in sold:
+        Product.objects.filter(pk=row['product_id']).update(
+            units_sold=row['total'] or 0, units_sold_30d=row['recent'] or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0008_contactpage_contactsubmission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='units_sold',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='units_sold_30d',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-units_sold', '-id'], name='product_units_sold_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['-units_sold_30d', '-id'], name='product_units_sold_30d_idx'),
+        ),
+        migrations.RunPython(backfill_units_sold, migrations.RunPython.noop),
+    ]
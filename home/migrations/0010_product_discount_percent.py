@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:26
+
+import django.db.models.expressions
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0009_product_units_sold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='discount_percent',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(is_sale=True, price__gt=0, sale_price__lt=models.F('price'), then=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('price'), '-', models.F('sale_price')), '*', models.Value(Decimal('100'))), '/', models.F('price'))), default=models.Value(Decimal('0'))), output_field=models.DecimalField(decimal_places=2, max_digits=5)),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['is_sale', '-discount_percent', '-id'], name='product_sale_discount_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:02
+
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import DatabaseError, migrations, transaction
+
+
+def create_search_indexes(apps, schema_editor):
+    # GIN/trigram indexes only exist on PostgreSQL; other databases use the icontains backend
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    Product = apps.get_model('home', 'Product')
+    Product.objects.update(search_vector=(
+        SearchVector('name', config='simple', weight='A')
+        + SearchVector('top_note', 'middle_note', 'base_note', config='simple', weight='B')
+        + SearchVector('product_type', 'product_gender', config='simple', weight='C')
+        + SearchVector('details', config='english', weight='D')
+    ))
+    schema_editor.execute('CREATE INDEX product_search_vector_idx ON home_product USING gin (search_vector)')
+
+    # pg_trgm powers the typo fallback; skip it quietly if the role may not create extensions
+    try:
+        with transaction.atomic():
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        return
+    schema_editor.execute('CREATE INDEX product_name_trgm_idx ON home_product USING gin (name gin_trgm_ops)')
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS product_name_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS product_search_vector_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0011_catalog_access_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
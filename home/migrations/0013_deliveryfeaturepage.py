@@ -0,0 +1,60 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def pages_to_targets(apps, schema_editor):
+    DeliveryFeature = apps.get_model('home', 'DeliveryFeature')
+    DeliveryFeaturePage = apps.get_model('home', 'DeliveryFeaturePage')
+    targets = []
+    for feature in DeliveryFeature.objects.only('id', 'pages'):
+        tokens = []
+        for token in (feature.pages or '').lower().split(','):
+            token = token.strip()[:30]
+            if token and token not in tokens:
+                tokens.append(token)
+        # Blank used to mean "every page"
+        if not tokens or 'all' in tokens:
+            tokens = ['all']
+        targets.extend(DeliveryFeaturePage(feature_id=feature.id, page=token) for token in tokens)
+    DeliveryFeaturePage.objects.bulk_create(targets, batch_size=500)
+
+
+def targets_to_pages(apps, schema_editor):
+    DeliveryFeature = apps.get_model('home', 'DeliveryFeature')
+    DeliveryFeaturePage = apps.get_model('home', 'DeliveryFeaturePage')
+    pages = {}
+    for feature_id, page in DeliveryFeaturePage.objects.order_by('id').values_list('feature_id', 'page'):
+        pages.setdefault(feature_id, []).append(page)
+    for feature in DeliveryFeature.objects.only('id', 'pages'):
+        keys = pages.get(feature.id, [])
+        feature.pages = 'all' if 'all' in keys else ','.join(keys)
+        feature.save(update_fields=['pages'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0012_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeliveryFeaturePage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page', models.CharField(choices=[('all', 'All pages'), ('home', 'Home'), ('shop', 'Shop'), ('product', 'Product detail'), ('cart', 'Cart'), ('checkout', 'Checkout'), ('category_male', 'Male category'), ('category_female', 'Female category'), ('category_unisex', 'Unisex category'), ('search', 'Search results'), ('about', 'About'), ('contact', 'Contact'), ('profile', 'Profile'), ('thankyou', 'Thank you')], max_length=30)),
+                ('feature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='targets', to='home.deliveryfeature')),
+            ],
+            options={
+                'ordering': ['feature', 'page'],
+                'constraints': [models.UniqueConstraint(fields=('page', 'feature'), name='deliveryfeaturepage_unique')],
+            },
+        ),
+        migrations.RunPython(pages_to_targets, targets_to_pages),
+        migrations.RemoveField(
+            model_name='deliveryfeature',
+            name='pages',
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0014_order_checkout_token'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('volume_option', models.CharField(choices=[('50 ml', '50 ml'), ('30 ml', '30 ml'), ('10 ml combo', '10 ml combo')], default='50 ml', max_length=20)),
+                ('on_hand', models.PositiveIntegerField(default=0)),
+                ('reserved', models.PositiveIntegerField(default=0, editable=False)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_levels', to='home.product')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('held', 'Held'), ('settled', 'Settled'), ('released', 'Released')], default='held', max_length=10)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='home.order')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='home.stocklevel')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='stocklevel',
+            constraint=models.UniqueConstraint(fields=('product', 'volume_option'), name='stocklevel_sku_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocklevel',
+            constraint=models.CheckConstraint(condition=models.Q(('reserved__lte', models.F('on_hand'))), name='stocklevel_not_oversold'),
+        ),
+        migrations.AddIndex(
+            model_name='stockreservation',
+            index=models.Index(fields=['status', 'expires_at'], name='stockres_status_expiry_idx'),
+        ),
+    ]
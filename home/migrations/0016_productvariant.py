@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0015_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('volume_option', models.CharField(choices=[('50 ml', '50 ml'), ('30 ml', '30 ml'), ('10 ml combo', '10 ml combo')], max_length=20)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('sale_price', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='home.product')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('product', 'volume_option'), name='productvariant_unique')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0017_task'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='video_mp4',
+            field=models.FileField(blank=True, editable=False, upload_to='videos/%y'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='video_poster',
+            field=models.ImageField(blank=True, editable=False, upload_to='video_posters/%y'),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='video_source',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='video_webm',
+            field=models.FileField(blank=True, editable=False, upload_to='videos/%y'),
+        ),
+    ]
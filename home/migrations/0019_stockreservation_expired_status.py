@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0018_product_video_renditions'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='stockreservation',
+            name='status',
+            field=models.CharField(choices=[('held', 'Held'), ('settled', 'Settled'), ('released', 'Released'), ('expired', 'Expired')], default='held', max_length=10),
+        ),
+    ]
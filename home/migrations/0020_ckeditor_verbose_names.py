@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:13
+
+import django_ckeditor_5.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0019_stockreservation_expired_status'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='abouthighlight',
+            name='text',
+            field=django_ckeditor_5.fields.CKEditor5Field(verbose_name='Text'),
+        ),
+        migrations.AlterField(
+            model_name='aboutpage',
+            name='content',
+            field=django_ckeditor_5.fields.CKEditor5Field(blank=True, null=True, verbose_name='Text'),
+        ),
+    ]
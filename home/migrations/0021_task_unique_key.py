@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-18 07:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0020_ckeditor_verbose_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='unique_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='task',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'queued')), fields=('unique_key',), name='task_unique_queued'),
+        ),
+    ]
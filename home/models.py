@@ -2,8 +2,10 @@ from django.db import models
 from django.contrib.auth import get_user_model
 from django.conf import settings
 from django.db.models.signals import post_save
+from django.utils import timezone
 from django.dispatch import receiver
 from decimal import Decimal
+from django.contrib.postgres.search import SearchVectorField
 from django_ckeditor_5.fields import CKEditor5Field
 
 User = get_user_model()
@@ -65,9 +67,61 @@ class Product(models.Model):
 
     video = models.FileField(upload_to='videos_uploaded/%y', blank=True, null=True)
 
+    # Web renditions of ``video`` made by home/video.py, for the upload named in ``video_source``
+    video_mp4 = models.FileField(upload_to='videos/%y', blank=True, editable=False)
+    video_webm = models.FileField(upload_to='videos/%y', blank=True, editable=False)
+    video_poster = models.ImageField(upload_to='video_posters/%y', blank=True, editable=False)
+    video_source = models.CharField(max_length=255, blank=True, editable=False)
+
+    # Denormalized sales counters for the "popular" sort (see home/sales.py)
+    units_sold = models.PositiveIntegerField(default=0, editable=False)
+    units_sold_30d = models.PositiveIntegerField(default=0, editable=False)
+
+    # Stored by the database from price/sale_price/is_sale, used by the "sale" sort
+    discount_percent = models.GeneratedField(
+        expression=models.Case(
+            models.When(
+                is_sale=True, price__gt=0, sale_price__lt=models.F('price'),
+                then=(models.F('price') - models.F('sale_price')) * models.Value(Decimal('100')) / models.F('price'),
+            ),
+            default=models.Value(Decimal('0')),
+        ),
+        output_field=models.DecimalField(max_digits=5, decimal_places=2),
+        db_persist=True,
+    )
+
+    # Maintained by home/search.py; only populated/indexed (GIN) on PostgreSQL
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        # One index per listing access path in home/catalog.py (filter + SORTS ordering).
+        # ``manage.py check_query_plans`` verifies that none of them falls back to a seq scan.
+        indexes = [
+            models.Index(fields=['is_sale', '-discount_percent', '-id'], name='product_sale_discount_idx'),
+            models.Index(fields=['-units_sold', '-id'], name='product_units_sold_idx'),
+            models.Index(fields=['-units_sold_30d', '-id'], name='product_units_sold_30d_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['product_gender', '-id'], name='product_gender_new_idx'),
+            models.Index(fields=['product_gender', 'price', 'id'], name='product_gender_price_idx'),
+            models.Index(fields=['product_gender', 'name', 'id'], name='product_gender_name_idx'),
+            models.Index(fields=['product_gender', '-units_sold', '-id'], name='product_gender_popular_idx'),
+            models.Index(
+                fields=['product_gender', '-discount_percent', '-id'], name='product_gender_sale_idx',
+                condition=models.Q(is_sale=True),
+            ),
+            models.Index(fields=['-id'], name='product_is_popular_idx', condition=models.Q(is_popular=True)),
+            models.Index(fields=['-id'], name='product_new_idx', condition=models.Q(new_product=True)),
+        ]
+
     def __str__(self):
         return self.name
 
+    @property
+    def video_ready(self):
+        """Whether the web renditions match the current upload."""
+        return bool(self.video and self.video_mp4 and self.video_source == self.video.name)
+
 
 # --------------------
 # Featured Product
@@ -114,14 +168,29 @@ class DeliveryFeature(models.Model):
         ("shield", "Shield (Cash on Delivery)"),
         ("return", "Return Arrow"),
     )
+    PAGE_CHOICES = [
+        ('all', 'All pages'),
+        ('home', 'Home'),
+        ('shop', 'Shop'),
+        ('product', 'Product detail'),
+        ('cart', 'Cart'),
+        ('checkout', 'Checkout'),
+        ('category_male', 'Male category'),
+        ('category_female', 'Female category'),
+        ('category_unisex', 'Unisex category'),
+        ('search', 'Search results'),
+        ('about', 'About'),
+        ('contact', 'Contact'),
+        ('profile', 'Profile'),
+        ('thankyou', 'Thank you'),
+    ]
 
     title = models.CharField(max_length=100)
     description = models.TextField(blank=True, null=True)
     icon = models.CharField(max_length=20, choices=ICON_CHOICES, default="truck")
     icon_color = models.CharField(max_length=20, default="#111111", help_text="CSS color, e.g., #111111 or 'black'")
     icon_size = models.PositiveIntegerField(default=24, help_text="Icon size in pixels")
-    # Comma-separated page keys where this feature should appear. Leave blank for all pages.
-    pages = models.CharField(max_length=200, blank=True, null=True, help_text="Comma-separated: all, home, shop, product, cart, checkout, category_male, category_female, category_unisex, search, about, contact, profile, thankyou")
+    # Pages the feature appears on are rows in DeliveryFeaturePage (``targets``)
     # Deprecated: kept for backward compat, no longer used in templates
     icon_html = models.TextField(blank=True, null=True, help_text="Deprecated. Use icon picker above.")
     is_active = models.BooleanField(default=True)
@@ -134,6 +203,25 @@ class DeliveryFeature(models.Model):
     def __str__(self):
         return self.title
 
+    @property
+    def page_keys(self):
+        return [target.page for target in self.targets.all()]
+
+
+class DeliveryFeaturePage(models.Model):
+    """One page a delivery feature is shown on. ``page='all'`` means every page."""
+    feature = models.ForeignKey(DeliveryFeature, on_delete=models.CASCADE, related_name='targets')
+    page = models.CharField(max_length=30, choices=DeliveryFeature.PAGE_CHOICES)
+
+    class Meta:
+        ordering = ['feature', 'page']
+        constraints = [
+            models.UniqueConstraint(fields=['page', 'feature'], name='deliveryfeaturepage_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.feature} @ {self.page}"
+
 # --------------------
 # About Page (dynamic content)
 # --------------------
@@ -229,7 +317,8 @@ class Cart(models.Model):
         return f"{self.user.username}'s Cart"
 
     def total_price(self):
-        return sum(item.total_price() for item in self.items.all())
+        from .cart import cart_subtotal
+        return cart_subtotal(self.user)
 
 
 class CartItem(models.Model):
@@ -243,8 +332,31 @@ class CartItem(models.Model):
     quantity = models.PositiveIntegerField(default=1)
     volume_option = models.CharField(max_length=20, choices=VOLUME_CHOICES, default="50 ml")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['cart', 'product', 'volume_option'], name='cartitem_line_idx'),
+        ]
+
     def total_price(self):
-        return self.product.price * self.quantity
+        from .pricing import quote
+        return quote(self.product, self.volume_option).unit_price * self.quantity
+
+
+class ProductVariant(models.Model):
+    """Price of a product in one volume. Volumes without a row use the product's own price."""
+    product = models.ForeignKey(Product, related_name='variants', on_delete=models.CASCADE)
+    volume_option = models.CharField(max_length=20, choices=CartItem.VOLUME_CHOICES)
+    price = models.DecimalField(decimal_places=2, max_digits=8)
+    # Used while the product is on sale (Product.is_sale), like Product.sale_price
+    sale_price = models.DecimalField(decimal_places=2, max_digits=8, blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'volume_option'], name='productvariant_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} {self.volume_option}"
 
 
 # ------ Order Model ------
@@ -271,6 +383,22 @@ class Order(models.Model):
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)      # Subtotal + Delivery
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Hidden token from the checkout form; a resubmitted form finds the order it already placed
+    checkout_token = models.UUIDField(unique=True, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+            models.Index(fields=['order_status', '-created_at'], name='order_status_created_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the status as loaded so status transitions can be detected on save
+        status = dict(zip(field_names, values)).get('order_status')
+        instance._loaded_status = None if status is models.DEFERRED else status
+        return instance
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
@@ -290,3 +418,96 @@ class OrderItem(models.Model):
 
     def __str__(self):
         return f"{self.product.name} ({self.quantity})"
+
+
+# ------ Stock ------
+class StockLevel(models.Model):
+    """
+    Stock of one SKU (product + volume). A product/volume without a row is
+    not stock-tracked and can always be ordered.
+    """
+    product = models.ForeignKey(Product, related_name='stock_levels', on_delete=models.CASCADE)
+    volume_option = models.CharField(max_length=20, choices=CartItem.VOLUME_CHOICES, default="50 ml")
+    on_hand = models.PositiveIntegerField(default=0)
+    reserved = models.PositiveIntegerField(default=0, editable=False)  # held by pending orders
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'volume_option'], name='stocklevel_sku_unique'),
+            models.CheckConstraint(condition=models.Q(reserved__lte=models.F('on_hand')), name='stocklevel_not_oversold'),
+        ]
+
+    def __str__(self):
+        return f"{self.product.name} {self.volume_option}: {self.available} available"
+
+    @property
+    def available(self):
+        return self.on_hand - self.reserved
+
+
+class StockReservation(models.Model):
+    HELD = 'held'
+    SETTLED = 'settled'
+    RELEASED = 'released'
+    EXPIRED = 'expired'  # stock given back after STOCK_RESERVATION_HOURS; the order is untouched
+    STATUS_CHOICES = (
+        (HELD, "Held"),
+        (SETTLED, "Settled"),
+        (RELEASED, "Released"),
+        (EXPIRED, "Expired"),
+    )
+    order = models.ForeignKey(Order, related_name='stock_reservations', on_delete=models.CASCADE)
+    stock = models.ForeignKey(StockLevel, related_name='reservations', on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=HELD)
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at'], name='stockres_status_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.quantity} x {self.stock} for order #{self.order_id} ({self.status})"
+
+
+class Task(models.Model):
+    """A unit of background work run by ``manage.py runworker`` (see ``home.tasks``)."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    )
+    name = models.CharField(max_length=200)  # dotted path of the function to call
+    args = models.JSONField(default=list, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    priority = models.SmallIntegerField(default=0, help_text="Higher runs first.")
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    worker = models.CharField(max_length=100, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Refreshed by the worker while the task runs; a stale one means the worker died
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    # Hash of name + args for enqueue(unique=True), cleared when the task is claimed
+    unique_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_after'], name='task_queue_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['unique_key'], condition=models.Q(status='queued'), name='task_unique_queued'),
+        ]
+
+    def __str__(self):
+        return f"{self.name}{tuple(self.args)} ({self.status})"
@@ -0,0 +1,217 @@
+"""
+Order-history PDFs, built off the request thread and kept in private storage.
+
+``history_for`` reads a user's orders and their lines in two flat queries.
+The PDF is stored under a hash of exactly that content, so it is only
+rebuilt when an order, a status or a line actually changes; otherwise the
+stored file is served as is. Files live in the ``private`` storage
+(``PRIVATE_ROOT``), outside MEDIA_ROOT, so ``/media/`` never serves them;
+only the profile download view streams them to their owner.
+
+A missing PDF is rendered by a ``build_history_pdf`` task on the worker
+(``home.tasks``) while the view tells the browser to retry, so a long
+history never ties up a web worker. The queued ``Task`` row is the only
+build state, so web processes and the worker agree on it whatever the cache
+backend: a queued or running task means "still building", and a task that
+failed within ``FAILURE_TIMEOUT`` is reported instead of polled again.
+"""
+import hashlib
+import io
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.utils import timezone
+
+from .models import Order, OrderItem, Task
+from .tasks import enqueue
+
+STORAGE_DIR = 'order-history'
+LAYOUT_VERSION = 2  # bump when the PDF layout changes to drop every stored file
+BUILD_TASK = 'home.order_pdf.build_history_pdf'
+FAILURE_TIMEOUT = timedelta(minutes=10)
+
+
+class HistoryPDFError(Exception):
+    pass
+
+
+def pdf_storage():
+    return storages['private']
+
+
+def history_for(user):
+    """``user``'s orders, newest first, as dicts with an ``items`` list of ``(name, quantity, price)``."""
+    orders = list(
+        Order.objects.filter(user=user)
+        .order_by('-created_at', '-id')
+        .values('id', 'order_status', 'delivery_charge', 'total_price', 'created_at')
+    )
+    lines = {}
+    items = (
+        OrderItem.objects.filter(order__user=user)
+        .order_by('id')
+        .values_list('order_id', 'product__name', 'quantity', 'price')
+    )
+    for order_id, name, quantity, price in items:
+        lines.setdefault(order_id, []).append((name, quantity, price))
+    for order in orders:
+        order['items'] = lines.get(order['id'], [])
+    return orders
+
+
+def pdf_path(user, orders):
+    digest = hashlib.sha256(repr((LAYOUT_VERSION, user.username, orders)).encode()).hexdigest()
+    return f"{STORAGE_DIR}/{user.pk}/{digest[:32]}.pdf"
+
+
+def history_pdf(user):
+    """
+    Path (in ``pdf_storage()``) of ``user``'s current order-history PDF, or
+    ``None`` while it is still being built (a build is queued if none is
+    pending). Raises ``HistoryPDFError`` if building this version failed recently.
+    """
+    orders = history_for(user)
+    path = pdf_path(user, orders)
+    if pdf_storage().exists(path):
+        return path
+    task = Task.objects.filter(name=BUILD_TASK, args=[user.pk, path]).order_by('-id').first()
+    if task is not None and task.status in (Task.QUEUED, Task.RUNNING):
+        return None
+    if task is not None and task.status == Task.FAILED and task.finished_at > timezone.now() - FAILURE_TIMEOUT:
+        raise HistoryPDFError("Your order history PDF could not be prepared. Please try again later.")
+    # One attempt: the shopper is waiting, and the failed task reports it
+    enqueue(BUILD_TASK, user.pk, path, priority=10, max_attempts=1, unique=True)
+    return None
+
+
+def build_history_pdf(user_id, requested_path):
+    """
+    Task: render and store the current order-history PDF of user ``user_id``.
+    ``requested_path`` only identifies the task for ``history_pdf``.
+    """
+    user = get_user_model().objects.filter(pk=user_id).first()
+    if user is None:
+        return
+    orders = history_for(user)
+    path = pdf_path(user, orders)
+    storage = pdf_storage()
+    if not storage.exists(path):
+        storage.save(path, ContentFile(render_history(user.username, orders)))
+    _remove_stale(storage, path)
+
+
+def _remove_stale(storage, path):
+    folder, current = os.path.split(path)
+    try:
+        _, files = storage.listdir(folder)
+    except (FileNotFoundError, NotImplementedError):
+        return
+    for name in files:
+        if name != current:
+            storage.delete(f"{folder}/{name}")
+
+
+def _logo_path():
+    candidates = [os.path.join(getattr(settings, 'STATIC_ROOT', None) or '', 'images', 'logonew.png')]
+    candidates += [os.path.join(str(folder), 'images', 'logonew.png') for folder in getattr(settings, 'STATICFILES_DIRS', [])]
+    candidates.append(os.path.join(settings.BASE_DIR, 'static', 'images', 'logonew.png'))
+    return next((path for path in candidates if os.path.exists(path)), None)
+
+
+def render_history(username, orders):
+    """Render ``orders`` (from ``history_for``) to PDF bytes with ReportLab."""
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.lib.units import mm
+    from reportlab.platypus import Image, Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, leftMargin=18*mm, rightMargin=18*mm, topMargin=18*mm, bottomMargin=18*mm)
+    elements = []
+
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle('Title', parent=styles['Heading1'], fontSize=16, textColor=colors.HexColor('#111111'), spaceAfter=8)
+    subtitle_style = ParagraphStyle('Sub', parent=styles['Normal'], fontSize=10, textColor=colors.grey)
+    section_title = ParagraphStyle('Section', parent=styles['Heading2'], fontSize=12, spaceBefore=8, spaceAfter=6, textColor=colors.HexColor('#111111'))
+    cell_style = styles['Normal']
+
+    # Header row with logo and title
+    logo_img = None
+    logo_path = _logo_path()
+    if logo_path:
+        try:
+            logo_img = Image(logo_path, width=40*mm, height=14*mm, kind='proportional')
+        except Exception:
+            pass
+
+    header_cells = [[logo_img if logo_img else Paragraph('<b>Zenko</b>', styles['Heading2']), Paragraph('Order History', title_style)]]
+    header_tbl = Table(header_cells, colWidths=[60*mm, None])
+    header_tbl.setStyle(TableStyle([
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('ALIGN', (1,0), (1,0), 'RIGHT'),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+    ]))
+    elements.append(header_tbl)
+    generated = timezone.now().strftime('%Y-%m-%d %H:%M UTC')
+    elements.append(Paragraph(f"User: {username} &nbsp;&nbsp; • &nbsp;&nbsp; Generated: {generated}", subtitle_style))
+    elements.append(Spacer(1, 8))
+
+    if not orders:
+        elements.append(Paragraph('No orders found.', styles['Normal']))
+
+    # For each order, build a table
+    for order in orders:
+        elements.append(Paragraph(f"Order #{order['id']}", section_title))
+
+        data = [[
+            Paragraph('<b>Product</b>', styles['Normal']),
+            Paragraph('<b>Qty</b>', styles['Normal']),
+            Paragraph('<b>Price</b>', styles['Normal']),
+            Paragraph('<b>Total</b>', styles['Normal']),
+        ]]
+
+        for name, quantity, price in order['items']:
+            data.append([
+                Paragraph(name or 'Item', cell_style),
+                str(quantity),
+                f"{price} ৳",
+                f"{quantity * price} ৳",
+            ])
+
+        # Totals rows
+        data.append(['', '', 'Delivery:', f"{order['delivery_charge'] or 0} ৳"])
+        data.append(['', '', 'Order Total:', f"{order['total_price']} ৳"])
+
+        tbl = Table(data, colWidths=[90*mm, 20*mm, 30*mm, 30*mm])
+        tbl.setStyle(TableStyle([
+            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#F3F4F6')),
+            ('TEXTCOLOR', (0,0), (-1,0), colors.HexColor('#111111')),
+            ('ALIGN', (1,1), (-1,-3), 'RIGHT'),
+            ('ALIGN', (0,0), (0,-1), 'LEFT'),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('FONTNAME', (0,-1), (-1,-1), 'Helvetica-Bold'),
+            ('FONTNAME', (0,-2), (-1,-2), 'Helvetica'),
+            ('GRID', (0,0), (-1,-3), 0.25, colors.HexColor('#E5E7EB')),
+            ('LINEABOVE', (-2,-2), (-1,-2), 0.5, colors.HexColor('#E5E7EB')),
+            ('LINEABOVE', (-2,-1), (-1,-1), 0.75, colors.HexColor('#9CA3AF')),
+            ('BACKGROUND', (-2,-1), (-1,-1), colors.HexColor('#F9FAFB')),
+            ('RIGHTPADDING', (0,0), (-1,-1), 6),
+            ('LEFTPADDING', (0,0), (-1,-1), 6),
+            ('TOPPADDING', (0,0), (-1,-1), 6),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+        ]))
+        elements.append(tbl)
+
+        # Status row
+        status = order['order_status'] or 'pending'
+        elements.append(Spacer(1, 4))
+        elements.append(Paragraph(f"<font color='#6B7280'>Status:</font> <b>{status.title()}</b>", styles['Normal']))
+        elements.append(Spacer(1, 12))
+
+    doc.build(elements)
+    return buffer.getvalue()
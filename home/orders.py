@@ -0,0 +1,99 @@
+"""
+Turning a signed-in user's cart into an ``Order``.
+
+Everything happens in one transaction: the cart and its lines are locked,
+the order and all its items are written with one insert each, sales counters
+are bumped, stock is reserved (see ``home.stock``) and the cart is emptied
+with a single DELETE. The checkout form
+carries a hidden ``checkout_token``; resubmitting it (double click, retry
+after a timeout) returns the order that token already placed instead of
+creating another one.
+"""
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+
+from .cart import forget_cart_count
+from .models import Cart, CartItem, Order, OrderItem
+from .pricing import quote, variants_for
+from .sales import adjust_units_sold
+from .stock import reserve_stock
+
+DELIVERY_CHARGES = {
+    'inside_dhaka': Decimal('50.00'),
+}
+DEFAULT_DELIVERY_CHARGE = Decimal('80.00')
+
+ORDER_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'address', 'country', 'order_notes')
+
+
+class EmptyCartError(Exception):
+    pass
+
+
+def delivery_charge_for(country):
+    return DELIVERY_CHARGES.get(country, DEFAULT_DELIVERY_CHARGE)
+
+
+def place_order(user, data, token=None):
+    """
+    Place an order for ``user``'s cart from checkout form ``data``.
+
+    Returns ``(order, created)``; ``created`` is False when ``token`` already
+    placed an order. Raises ``EmptyCartError`` if there is nothing to order
+    and ``home.stock.OutOfStockError`` if a stock-tracked line is short.
+    """
+    try:
+        with transaction.atomic():
+            # Locking the cart row serialises concurrent checkouts of the same cart
+            cart = Cart.objects.select_for_update().filter(user=user).first()
+            if token:
+                existing = Order.objects.filter(user=user, checkout_token=token).first()
+                if existing:
+                    return existing, False
+
+            items = []
+            if cart is not None:
+                items = list(
+                    CartItem.objects.select_for_update(of=('self',))
+                    .filter(cart=cart)
+                    .select_related('product')
+                    .order_by('id')
+                )
+            if not items:
+                raise EmptyCartError
+
+            variants = variants_for(item.product_id for item in items)
+            prices = {item.pk: quote(item.product, item.volume_option, variants).unit_price for item in items}
+            delivery_charge = delivery_charge_for(data.get('country'))
+            subtotal = sum((prices[item.pk] * item.quantity for item in items), Decimal('0.00'))
+            order = Order.objects.create(
+                user=user,
+                order_status='pending',
+                delivery_charge=delivery_charge,
+                total_price=subtotal + delivery_charge,
+                checkout_token=token,
+                **{field: data.get(field) for field in ORDER_FIELDS},
+            )
+            order_items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product=item.product,
+                    quantity=item.quantity,
+                    price=prices[item.pk],
+                    volume_option=item.volume_option,
+                )
+                for item in items
+            ])
+            reserve_stock(order, order_items)
+            adjust_units_sold(order_items)
+            CartItem.objects.filter(cart=cart).delete()
+    except IntegrityError:
+        # Another request with the same token won the race
+        existing = Order.objects.filter(user=user, checkout_token=token).first() if token else None
+        if existing is None:
+            raise
+        return existing, False
+
+    forget_cart_count(user)
+    return order, True
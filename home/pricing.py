@@ -0,0 +1,66 @@
+"""
+The one place prices are worked out.
+
+A product is priced per volume by its ``ProductVariant`` row, falling back
+to ``Product.price`` for volumes without one. While ``Product.is_sale`` is
+set, a lower ``sale_price`` (on the variant or the product) is what the
+customer pays. Callers pricing many lines load the variants once with
+``variants_for`` and pass them to ``quote``; the product page reads a
+cached ``price_matrix``, dropped when the product or its variants change.
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.core.cache import cache
+
+from .models import CartItem, ProductVariant
+
+VOLUMES = [volume for volume, _ in CartItem.VOLUME_CHOICES]
+DEFAULT_VOLUME = '50 ml'
+MATRIX_CACHE_KEY = 'home:price-matrix:{}'
+MATRIX_TIMEOUT = 60 * 60 * 24
+
+
+@dataclass(frozen=True)
+class Quote:
+    price: Decimal
+    sale_price: Decimal = None  # set only while the sale applies
+
+    @property
+    def on_sale(self):
+        return self.sale_price is not None
+
+    @property
+    def unit_price(self):
+        return self.sale_price if self.on_sale else self.price
+
+
+def variants_for(product_ids):
+    """``{(product_id, volume_option): ProductVariant}`` for ``product_ids``, in one query."""
+    variants = ProductVariant.objects.filter(product_id__in=set(product_ids))
+    return {(variant.product_id, variant.volume_option): variant for variant in variants}
+
+
+def quote(product, volume_option, variants=None):
+    if variants is None:
+        variants = variants_for([product.pk])
+    variant = variants.get((product.pk, volume_option))
+    price, sale_price = (variant.price, variant.sale_price) if variant else (product.price, product.sale_price)
+    if product.is_sale and sale_price and 0 < sale_price < price:
+        return Quote(price, sale_price)
+    return Quote(price)
+
+
+def price_matrix(product):
+    """``{volume_option: Quote}`` for every volume, cached per product."""
+    key = MATRIX_CACHE_KEY.format(product.pk)
+    matrix = cache.get(key)
+    if matrix is None:
+        variants = variants_for([product.pk])
+        matrix = {volume: quote(product, volume, variants) for volume in VOLUMES}
+        cache.set(key, matrix, MATRIX_TIMEOUT)
+    return matrix
+
+
+def invalidate_price_matrix(product_id):
+    cache.delete(MATRIX_CACHE_KEY.format(product_id))
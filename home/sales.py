@@ -0,0 +1,109 @@
+"""
+Sales-rank counters backing the "popular" sort.
+
+``Product.units_sold`` and ``Product.units_sold_30d`` are kept up to date
+incrementally: checkout adds the ordered quantities, and cancelling an
+order or deleting it (or one of its lines) takes them back off. The 30-day
+counter cannot expire old sales on its own, so ``manage.py
+rebuild_sales_ranks`` should also run daily (cron) to recompute both
+counters from ``OrderItem``.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Order, OrderItem, Product
+
+RECENT_WINDOW = timedelta(days=30)
+
+
+def _quantities_by_product(items):
+    totals = defaultdict(int)
+    for item in items:
+        totals[item.product_id] += item.quantity
+    return totals
+
+
+def adjust_units_sold(items, sign=1, recent=True):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) the quantities of ``items``
+    from the per-product counters in a single UPDATE.
+
+    ``items`` is any iterable of objects with ``product_id`` and ``quantity``
+    (OrderItem instances, usually). ``recent`` controls whether the 30-day
+    counter is touched as well.
+    """
+    totals = _quantities_by_product(items)
+    if not totals:
+        return
+
+    delta = Case(
+        *[When(pk=pk, then=Value(qty * sign)) for pk, qty in totals.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+    updates = {'units_sold': Greatest(F('units_sold') + delta, Value(0))}
+    if recent:
+        updates['units_sold_30d'] = Greatest(F('units_sold_30d') + delta, Value(0))
+    Product.objects.filter(pk__in=totals.keys()).update(**updates)
+
+
+def order_is_recent(order):
+    return order.created_at is None or order.created_at >= timezone.now() - RECENT_WINDOW
+
+
+def order_status_changed(order):
+    """Move an order's quantities in or out of the counters when it is (un)cancelled."""
+    previous = getattr(order, '_loaded_status', None)
+    current = order.order_status
+    if previous is None or previous == current:
+        return
+    if current == 'cancelled':
+        sign = -1
+    elif previous == 'cancelled':
+        sign = 1
+    else:
+        return
+    adjust_units_sold(order.items.only('product_id', 'quantity'), sign=sign, recent=order_is_recent(order))
+
+
+def order_item_deleted(item):
+    """
+    Take a deleted line's quantity off the counters, unless the cancellation
+    of its order already did.
+    """
+    # Deleting an order deletes its lines first, so the order row is still there
+    order = Order.objects.filter(pk=item.order_id).only('order_status', 'created_at').first()
+    if order is None or order.order_status == 'cancelled':
+        return
+    adjust_units_sold([item], sign=-1, recent=order_is_recent(order))
+
+
+def rebuild_sales_ranks():
+    """Recompute every product's counters from the order history. Returns the number of products updated."""
+    since = timezone.now() - RECENT_WINDOW
+    sold = (
+        OrderItem.objects.exclude(order__order_status='cancelled')
+        .values('product_id')
+        .annotate(
+            total=Sum('quantity'),
+            recent=Sum('quantity', filter=Q(order__created_at__gte=since)),
+        )
+    )
+    ranks = {row['product_id']: (row['total'] or 0, row['recent'] or 0) for row in sold}
+
+    products = list(Product.objects.only('id', 'units_sold', 'units_sold_30d'))
+    changed = []
+    for product in products:
+        total, recent = ranks.get(product.id, (0, 0))
+        if product.units_sold != total or product.units_sold_30d != recent:
+            product.units_sold = total
+            product.units_sold_30d = recent
+            changed.append(product)
+
+    with transaction.atomic():
+        Product.objects.bulk_update(changed, ['units_sold', 'units_sold_30d'], batch_size=500)
+    return len(changed)
@@ -0,0 +1,121 @@
+"""
+Pluggable product search.
+
+``get_search_backend()`` returns the backend named by ``settings.SEARCH_BACKEND``
+(a dotted path), or picks one from the database vendor when that is unset:
+
+* ``PostgresSearchBackend`` keeps ``Product.search_vector`` up to date and
+  answers from the GIN index with rank ordering, falling back to trigram
+  similarity on the name (pg_trgm) when nothing matches, e.g. for typos.
+* ``BasicSearchBackend`` is a plain ``icontains`` scan so SQLite dev works.
+"""
+import re
+from functools import lru_cache, reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+# Weighted: name > fragrance notes > type/gender > details
+PRODUCT_SEARCH_VECTOR_PARTS = (
+    (('name',), 'simple', 'A'),
+    (('top_note', 'middle_note', 'base_note'), 'simple', 'B'),
+    (('product_type', 'product_gender'), 'simple', 'C'),
+    (('details',), 'english', 'D'),
+)
+# Every column a product search (or live suggestion) matches against
+SEARCH_FIELDS = tuple(field for fields, _, _ in PRODUCT_SEARCH_VECTOR_PARTS for field in fields)
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def search_filter(term):
+    """Q object matching a free-text search term against the product text columns."""
+    return reduce(or_, (Q(**{f'{field}__icontains': term}) for field in SEARCH_FIELDS))
+
+
+class BasicSearchBackend:
+    """Substring match over the text columns. Unindexed, but portable."""
+
+    def search(self, qs, term, ranked=False):
+        qs = qs.filter(search_filter(term))
+        return qs.order_by('-id') if ranked else qs
+
+    def update_product(self, product):
+        pass
+
+    def rebuild(self):
+        return 0
+
+
+class PostgresSearchBackend:
+    """Full-text search over ``Product.search_vector`` with a trigram fallback."""
+
+    def __init__(self):
+        self._has_trigram = None
+
+    def search_vector(self):
+        from django.contrib.postgres.search import SearchVector
+
+        vector = None
+        for fields, config, weight in PRODUCT_SEARCH_VECTOR_PARTS:
+            part = SearchVector(*fields, config=config, weight=weight)
+            vector = part if vector is None else vector + part
+        return vector
+
+    def search_query(self, term):
+        """Prefix-match every word, so "ros oud" finds "Rose Oud" as the user types."""
+        from django.contrib.postgres.search import SearchQuery
+
+        words = _WORD_RE.findall(term.lower())
+        if not words:
+            return None
+        raw = ' & '.join(f"{word}:*" for word in words)
+        # names/notes are indexed unstemmed, details with the english stemmer
+        return SearchQuery(raw, search_type='raw', config='simple') | SearchQuery(raw, search_type='raw', config='english')
+
+    @property
+    def has_trigram(self):
+        if self._has_trigram is None:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+                self._has_trigram = cursor.fetchone() is not None
+        return self._has_trigram
+
+    def search(self, qs, term, ranked=False):
+        from django.contrib.postgres.search import SearchRank, TrigramSimilarity
+
+        query = self.search_query(term)
+        if query is None:
+            return qs.none()
+
+        matches = qs.filter(search_vector=query)
+        if ranked:
+            matches = matches.annotate(rank=SearchRank(F('search_vector'), query)).order_by('-rank', '-id')
+        if not self.has_trigram or matches.exists():
+            return matches
+
+        similar = qs.filter(name__trigram_similar=term)
+        if ranked:
+            similar = similar.annotate(similarity=TrigramSimilarity('name', term)).order_by('-similarity', '-id')
+        return similar
+
+    def update_product(self, product):
+        Product.objects.filter(pk=product.pk).update(search_vector=self.search_vector())
+
+    def rebuild(self):
+        return Product.objects.update(search_vector=self.search_vector())
+
+
+@lru_cache(maxsize=None)
+def get_search_backend():
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path:
+        return import_string(path)()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return BasicSearchBackend()
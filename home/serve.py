@@ -0,0 +1,188 @@
+"""
+Serving ``/media/`` and ``/static/`` from Django when nothing sits in front.
+
+Small deployments have no nginx or CDN, so Django serves uploaded media and
+collected static files itself (turn ``SERVE_FILES`` off once something
+else does). Unlike ``django.views.static.serve`` this:
+
+* answers ``If-None-Match``/``If-Modified-Since`` with 304 from an ETag
+  built from the file's mtime and size, and sets ``Cache-Control``;
+* honours a single ``Range: bytes=...`` (with ``If-Range``) with a 206, so
+  videos can be seeked;
+* streams an open file with ``FileResponse``, so WSGI servers with a
+  ``wsgi.file_wrapper`` (gunicorn, uWSGI) hand it to ``os.sendfile`` rather
+  than copying it through Python. A ranged response keeps the real file
+  descriptor and sets ``Content-Length`` to the range, so sendfile sends
+  exactly that slice;
+* for static files, sends the ``.br``/``.gz`` copy written by
+  ``build_assets`` when the client accepts it, and caches content-hashed
+  names (``site.<12 hex>.css``) for a year as ``immutable``.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+HASHED_NAME_RE = re.compile(r'\.[0-9a-f]{12}\.\w+$')
+Q_ZERO_RE = re.compile(r'^q=0(\.0{0,3})?$')
+IMMUTABLE_CACHE_SECONDS = 60 * 60 * 24 * 365
+# Best first
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class RangeFile:
+    """Read at most ``length`` bytes of ``file`` from ``start``; ``fileno`` stays usable for sendfile."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if self.remaining <= 0:
+            return b''
+        size = self.remaining if size is None or size < 0 else min(size, self.remaining)
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """``(start, end)`` (inclusive) for a single satisfiable byte range, ``None`` to ignore, or ``False`` if unsatisfiable."""
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None  # absent, malformed or multi-range: send the whole file
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if size == 0:
+        return False  # no byte of an empty file can be addressed
+    if not first:  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return False
+    return start, end
+
+
+def _range_applies(request, etag, mtime):
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def accepts_encoding(request, coding):
+    """Whether ``Accept-Encoding`` names ``coding`` without ``q=0``."""
+    for part in request.headers.get('Accept-Encoding', '').split(','):
+        name, _, params = part.partition(';')
+        if name.strip().lower() == coding:
+            return not Q_ZERO_RE.match(params.replace(' ', '').lower())
+    return False
+
+
+def _stat_file(fullpath):
+    try:
+        info = os.stat(fullpath)
+    except OSError:
+        return None
+    return info if stat.S_ISREG(info.st_mode) else None
+
+
+def serve(request, path, document_root, max_age=0, precompressed=False):
+    """
+    Serve ``path`` from under ``document_root`` with conditional and range
+    support; with ``precompressed``, prefer a ``.br``/``.gz`` sibling the
+    client accepts.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(document_root, path)
+    except SuspiciousFileOperation:
+        raise Http404("Not found")
+    info = _stat_file(fullpath)
+    if info is None:
+        raise Http404("Not found")
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    sendpath, vary = fullpath, False
+    if precompressed and encoding is None:
+        for coding, suffix in PRECOMPRESSED:
+            variant = _stat_file(fullpath + suffix)
+            if variant is None:
+                continue
+            vary = True
+            if sendpath == fullpath and accepts_encoding(request, coding):
+                sendpath, info, encoding = fullpath + suffix, variant, coding
+
+    size, mtime = info.st_size, info.st_mtime
+    tag = f'{info.st_mtime_ns:x}-{size:x}'
+    if sendpath != fullpath:
+        tag += f'-{encoding}'
+    etag = f'"{tag}"'
+
+    def finish(response):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(mtime)
+        response['Accept-Ranges'] = 'bytes'
+        if HASHED_NAME_RE.search(path):
+            patch_cache_control(response, public=True, max_age=IMMUTABLE_CACHE_SECONDS, immutable=True)
+        else:
+            patch_cache_control(response, public=True, max_age=max_age)
+        if vary:
+            patch_vary_headers(response, ['Accept-Encoding'])
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if not_modified is not None:
+        return finish(not_modified)
+
+    byte_range = parse_range(request.headers.get('Range'), size) if _range_applies(request, etag, mtime) else None
+
+    if byte_range is False:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return finish(response)
+
+    if byte_range is None:
+        response = FileResponse(open(sendpath, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        length = end - start + 1
+        response = FileResponse(RangeFile(open(sendpath, 'rb'), start, length), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(length)
+    if encoding:
+        response['Content-Encoding'] = encoding
+    return finish(response)
+
+
+def serve_media(request, path):
+    return serve(request, path, settings.MEDIA_ROOT, max_age=settings.MEDIA_CACHE_SECONDS)
+
+
+def serve_static(request, path):
+    return serve(request, path, settings.STATIC_ROOT, max_age=settings.STATIC_CACHE_SECONDS, precompressed=True)
+
@@ -0,0 +1,116 @@
+from django.contrib.auth.signals import user_logged_in
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .cart import merge_anonymous_cart
+from .catalog import invalidate_popular_items
+from .delivery import invalidate_feature_map
+from .fragments import fragment_models, invalidate_fragments_for
+from .images import needs_derivatives
+from .models import AboutPage, ContactPage, DeliveryFeature, DeliveryFeaturePage, Logo, Order, OrderItem, Product, ProductVariant, Slider
+from .pricing import invalidate_price_matrix
+from .sales import order_item_deleted, order_status_changed
+from .stock import order_status_changed as stock_status_changed, release_reservations
+from .search import get_search_backend
+from .tasks import enqueue
+from .video import needs_processing as video_needs_processing
+from .suggest import suggest_index
+from .thumbnails import invalidate_pools
+
+
+@receiver(post_save, sender=Order)
+def update_sales_ranks_on_status_change(sender, instance, created, **kwargs):
+    if not created:
+        order_status_changed(instance)
+        stock_status_changed(instance)
+    instance._loaded_status = instance.order_status
+
+
+@receiver(pre_delete, sender=Order)
+def release_stock_of_deleted_order(sender, instance, **kwargs):
+    release_reservations(instance)
+
+
+@receiver(post_delete, sender=OrderItem)
+def update_sales_ranks_on_line_delete(sender, instance, **kwargs):
+    order_item_deleted(instance)
+
+
+@receiver(user_logged_in)
+def merge_cart_on_login(sender, request, user, **kwargs):
+    # Every login path (sign-up, phone, admin, password) folds the guest cookie cart in
+    if request is not None:
+        merge_anonymous_cart(request, user)
+
+
+@receiver(post_save, sender=Product)
+def update_product_search_vector(sender, instance, **kwargs):
+    get_search_backend().update_product(instance)
+
+
+@receiver(post_save, sender=Product)
+def update_suggest_index(sender, instance, **kwargs):
+    suggest_index.product_changed(instance)
+
+
+@receiver(post_delete, sender=Product)
+def remove_from_suggest_index(sender, instance, **kwargs):
+    suggest_index.product_deleted(instance.pk)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_thumbnail_pools(sender, **kwargs):
+    invalidate_pools()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_popular_items(sender, **kwargs):
+    invalidate_popular_items()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def refresh_product_price_matrix(sender, instance, **kwargs):
+    invalidate_price_matrix(instance.pk)
+
+
+@receiver(post_save, sender=ProductVariant)
+@receiver(post_delete, sender=ProductVariant)
+def refresh_variant_price_matrix(sender, instance, **kwargs):
+    invalidate_price_matrix(instance.product_id)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Slider)
+@receiver(post_save, sender=Logo)
+@receiver(post_save, sender=AboutPage)
+@receiver(post_save, sender=ContactPage)
+def queue_image_derivatives(sender, instance, **kwargs):
+    # Only images without derivatives yet (i.e. new uploads) need the worker
+    if needs_derivatives(instance):
+        enqueue('home.images.build_derivatives', sender.__name__, instance.pk, priority=5, unique=True)
+
+
+@receiver(post_save, sender=Product)
+def queue_video_processing(sender, instance, **kwargs):
+    if video_needs_processing(instance):
+        enqueue('home.video.process_product_video', instance.pk, max_attempts=2, unique=True)
+
+
+@receiver(post_save, sender=DeliveryFeature)
+@receiver(post_delete, sender=DeliveryFeature)
+@receiver(post_save, sender=DeliveryFeaturePage)
+@receiver(post_delete, sender=DeliveryFeaturePage)
+def refresh_delivery_features(sender, **kwargs):
+    invalidate_feature_map()
+
+
+def invalidate_cached_fragments(sender, **kwargs):
+    invalidate_fragments_for(sender)
+
+
+for _model in fragment_models():
+    post_save.connect(invalidate_cached_fragments, sender=_model, dispatch_uid=f'home.fragments.save.{_model.__name__}')
+    post_delete.connect(invalidate_cached_fragments, sender=_model, dispatch_uid=f'home.fragments.delete.{_model.__name__}')
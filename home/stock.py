@@ -0,0 +1,164 @@
+"""
+Per-SKU stock and the reservations orders hold against it.
+
+Placing an order reserves its quantities: the stock rows are locked, then a
+single conditional UPDATE bumps ``reserved`` only where ``on_hand`` still
+covers it, so concurrent checkouts can never push ``reserved`` past
+``on_hand`` (a CHECK constraint backs this up). The reservation is settled
+(taken off ``on_hand``) when staff move the order past "pending" and
+released when it is cancelled.
+
+Checkout places real orders (there is no separate abandoned-cart stage), so
+an order that stays pending is never cancelled automatically. Instead
+``manage.py release_expired_reservations`` (cron) gives back the stock held
+past ``STOCK_RESERVATION_HOURS``, marking the reservation expired; if staff
+ship the order later, its quantities come off ``on_hand`` then, without
+going below what other orders hold.
+"""
+from datetime import timedelta
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import StockLevel, StockReservation
+
+
+class OutOfStockError(Exception):
+    def __init__(self, shortages):
+        # [(StockLevel, requested quantity), ...]
+        self.shortages = shortages
+        names = ', '.join(f"{stock.product.name} ({stock.volume_option})" for stock, _ in shortages)
+        super().__init__(f"Not enough stock for: {names}")
+
+
+def reservation_ttl():
+    return timedelta(hours=getattr(settings, 'STOCK_RESERVATION_HOURS', 48))
+
+
+def _per_stock(quantity_of):
+    return Case(
+        *[When(pk=pk, then=Value(qty)) for pk, qty in quantity_of.items()],
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def reserve_stock(order, lines):
+    """
+    Reserve stock for ``lines`` (objects with ``product_id``, ``volume_option``
+    and ``quantity``) on behalf of ``order``. Must run inside the order's
+    transaction; raises ``OutOfStockError`` if any tracked SKU is short.
+    """
+    wanted = {}
+    for line in lines:
+        key = (line.product_id, line.volume_option)
+        wanted[key] = wanted.get(key, 0) + line.quantity
+    if not wanted:
+        return []
+
+    sku_filter = reduce(or_, (Q(product_id=pk, volume_option=volume) for pk, volume in wanted))
+    # Lock in id order so overlapping checkouts cannot deadlock
+    stocks = list(
+        StockLevel.objects.select_for_update(of=('self',))
+        .filter(sku_filter)
+        .select_related('product')
+        .order_by('id')
+    )
+    if not stocks:
+        return []
+
+    quantity_of = {stock.pk: wanted[(stock.product_id, stock.volume_option)] for stock in stocks}
+    covered = reduce(or_, (Q(pk=pk, on_hand__gte=F('reserved') + qty) for pk, qty in quantity_of.items()))
+    updated = (
+        StockLevel.objects.filter(covered)
+        .update(reserved=F('reserved') + _per_stock(quantity_of))
+    )
+    if updated != len(stocks):
+        # The rows that did fit were bumped; the caller's atomic block rolls them back
+        shortages = [(stock, quantity_of[stock.pk]) for stock in stocks if stock.available < quantity_of[stock.pk]]
+        raise OutOfStockError(shortages or [(stock, quantity_of[stock.pk]) for stock in stocks])
+
+    expires_at = timezone.now() + reservation_ttl()
+    return StockReservation.objects.bulk_create([
+        StockReservation(order=order, stock=stock, quantity=quantity_of[stock.pk], expires_at=expires_at)
+        for stock in stocks
+    ])
+
+
+def _quantities(reservations):
+    quantity_of = {}
+    for reservation in reservations:
+        quantity_of[reservation.stock_id] = quantity_of.get(reservation.stock_id, 0) + reservation.quantity
+    return quantity_of
+
+
+def _close_reservations(order, settle):
+    with transaction.atomic():
+        open_reservations = list(
+            StockReservation.objects.select_for_update()
+            .filter(order=order, status__in=[StockReservation.HELD, StockReservation.EXPIRED])
+        )
+        if not open_reservations:
+            return 0
+        held = _quantities(r for r in open_reservations if r.status == StockReservation.HELD)
+        expired = _quantities(r for r in open_reservations if r.status == StockReservation.EXPIRED)
+        if held:
+            delta = _per_stock(held)
+            updates = {'reserved': F('reserved') - delta}
+            if settle:
+                updates['on_hand'] = F('on_hand') - delta
+            StockLevel.objects.filter(pk__in=held.keys()).update(**updates)
+        if expired and settle:
+            # Already given back, and other orders may hold it now: never go below their reservations
+            StockLevel.objects.filter(pk__in=expired.keys()).update(
+                on_hand=Greatest(F('on_hand') - _per_stock(expired), F('reserved')),
+            )
+        StockReservation.objects.filter(pk__in=[r.pk for r in open_reservations]).update(
+            status=StockReservation.SETTLED if settle else StockReservation.RELEASED,
+        )
+        return len(open_reservations)
+
+
+def settle_reservations(order):
+    """The order is going out: take its held quantities off the shelf for good."""
+    return _close_reservations(order, settle=True)
+
+
+def release_reservations(order):
+    """The order will not ship: give its held quantities back."""
+    return _close_reservations(order, settle=False)
+
+
+def order_status_changed(order):
+    """Settle or release an order's reservations when staff change its status."""
+    previous = getattr(order, '_loaded_status', None)
+    current = order.order_status
+    if previous is None or previous == current:
+        return
+    if current == 'cancelled':
+        release_reservations(order)
+    elif current != 'pending':
+        settle_reservations(order)
+
+
+def release_expired_reservations(now=None):
+    """
+    Give back the stock of held reservations past their expiry; the orders
+    keep their status. Returns the number of reservations released.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(
+            StockReservation.objects.select_for_update()
+            .filter(status=StockReservation.HELD, expires_at__lte=now)
+        )
+        if not expired:
+            return 0
+        quantity_of = _quantities(expired)
+        StockLevel.objects.filter(pk__in=quantity_of.keys()).update(reserved=F('reserved') - _per_stock(quantity_of))
+        StockReservation.objects.filter(pk__in=[r.pk for r in expired]).update(status=StockReservation.EXPIRED)
+    return len(expired)
@@ -0,0 +1,195 @@
+"""
+In-process prefix index behind the live search ``/suggest/`` endpoint.
+
+The index maps every lower-cased word of the columns product search matches
+(``home.search.SEARCH_FIELDS``: name, notes, type, gender, details) to
+product ids, kept in a sorted token list so a prefix lookup is a bisect plus
+a short scan. Suggestion payloads (including ``image1.url``) are serialized
+once when a product is indexed, not per keystroke.
+
+The server entry points (``zenko/wsgi.py``, ``zenko/asgi.py``) start the
+first build in a background thread; management commands and the test runner
+never build it. The index is then patched in place by the ``Product``
+save/delete signals and rebuilt when another process bumps the shared
+version key in the cache. Until a build finishes ``search()`` returns
+``None`` and the view queries the DB over the same columns.
+"""
+import bisect
+import logging
+import os
+import re
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils.html import strip_tags
+
+from .models import Product
+from .search import SEARCH_FIELDS
+
+logger = logging.getLogger(__name__)
+
+VERSION_CACHE_KEY = 'home:suggest-index-version'
+MAX_RESULTS = 8
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _words(text):
+    return _WORD_RE.findall((text or '').lower())
+
+
+def suggestion_payload(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'price': float(getattr(product, 'price', 0) or 0),
+        'image': product.image1.url if getattr(product, 'image1', None) else '',
+        'url': f"/product/{product.id}/",
+    }
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._building = None   # pid of the process whose thread is building (threads do not survive a fork)
+        self._reset()
+        self.started = False    # warm() was called: keep the index current from here on
+        self.ready = False
+        self.version = None
+
+    def _reset(self):
+        self.payloads = {}      # product id -> suggestion dict
+        self.names = {}         # product id -> lower-cased name
+        self.name_words = {}    # product id -> set of name words
+        self.product_words = {}  # product id -> set of all indexed words
+        self.postings = {}      # word -> set of product ids
+        self.words = []         # sorted keys of ``postings``
+
+    # ---------------------------
+    # Maintenance
+    # ---------------------------
+    def _add(self, product):
+        name_words = set(_words(product.name))
+        all_words = set(name_words)
+        for field in SEARCH_FIELDS:
+            all_words.update(_words(strip_tags(getattr(product, field, None) or '')))
+
+        self.payloads[product.id] = suggestion_payload(product)
+        self.names[product.id] = (product.name or '').lower()
+        self.name_words[product.id] = name_words
+        self.product_words[product.id] = all_words
+        for word in all_words:
+            ids = self.postings.get(word)
+            if ids is None:
+                self.postings[word] = {product.id}
+                bisect.insort(self.words, word)
+            else:
+                ids.add(product.id)
+
+    def _remove(self, product_id):
+        for word in self.product_words.pop(product_id, ()):
+            ids = self.postings.get(word)
+            if ids is None:
+                continue
+            ids.discard(product_id)
+            if not ids:
+                del self.postings[word]
+                del self.words[bisect.bisect_left(self.words, word)]
+        self.payloads.pop(product_id, None)
+        self.names.pop(product_id, None)
+        self.name_words.pop(product_id, None)
+
+    def rebuild(self):
+        version = cache.get(VERSION_CACHE_KEY)
+        products = Product.objects.only('id', 'price', 'image1', *SEARCH_FIELDS)
+        fresh = SuggestIndex()
+        for product in products.iterator(chunk_size=2000):
+            fresh._add(product)
+        with self._lock:
+            self.payloads, self.names, self.name_words = fresh.payloads, fresh.names, fresh.name_words
+            self.product_words, self.postings, self.words = fresh.product_words, fresh.postings, fresh.words
+            self.version = version
+            self.ready = True
+
+    def warm(self):
+        """Start a background (re)build unless one is already running. Called once at server startup."""
+        with self._lock:
+            self.started = True
+            if self._building == os.getpid():
+                return
+            self._building = os.getpid()
+        threading.Thread(target=self._build_in_background, name='suggest-index', daemon=True).start()
+
+    def _build_in_background(self):
+        try:
+            self.rebuild()
+        except Exception:
+            logger.exception("Building the search suggestion index failed")
+        finally:
+            connection.close()
+            with self._lock:
+                self._building = None
+
+    def product_changed(self, product):
+        with self._lock:
+            if self.ready:
+                self._remove(product.id)
+                self._add(product)
+        self._bump_version()
+
+    def product_deleted(self, product_id):
+        with self._lock:
+            if self.ready:
+                self._remove(product_id)
+        self._bump_version()
+
+    def _bump_version(self):
+        # Other processes compare against this and rebuild; ours is already up to date
+        version = uuid.uuid4().hex
+        cache.set(VERSION_CACHE_KEY, version, None)
+        with self._lock:
+            self.version = version
+
+    # ---------------------------
+    # Lookup
+    # ---------------------------
+    def _prefix_ids(self, prefix):
+        ids = set()
+        i = bisect.bisect_left(self.words, prefix)
+        while i < len(self.words) and self.words[i].startswith(prefix):
+            ids |= self.postings[self.words[i]]
+            i += 1
+        return ids
+
+    def search(self, query, limit=MAX_RESULTS):
+        """Suggestions for ``query``, or ``None`` if the index is not built yet."""
+        if not self.ready:
+            if self.started:
+                self.warm()  # e.g. a worker forked while the first build was running
+            return None
+        if cache.get(VERSION_CACHE_KEY) != self.version:
+            self.warm()  # keep answering from the current index meanwhile
+
+        words = _words(query)
+        if not words:
+            return []
+        phrase = query.strip().lower()
+        with self._lock:
+            matches = None
+            for word in words:
+                ids = self._prefix_ids(word)
+                matches = ids if matches is None else matches & ids
+                if not matches:
+                    return []
+
+            def rank(pk):
+                name_words = self.name_words[pk]
+                in_name = all(any(w.startswith(word) for w in name_words) for word in words)
+                return (not self.names[pk].startswith(phrase), not in_name, self.names[pk], pk)
+
+            return [self.payloads[pk] for pk in sorted(matches, key=rank)[:limit]]
+
+
+suggest_index = SuggestIndex()
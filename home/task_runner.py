@@ -0,0 +1,29 @@
+"""
+What runs inside ``runworker``'s pool processes.
+
+Kept apart from ``home.tasks`` because spawned processes import this module
+before Django is set up, so it must not import models at module level.
+"""
+import signal
+import traceback
+
+from django.db import close_old_connections
+from django.utils.module_loading import import_string
+
+
+def init_process():
+    import django
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent decides when to stop
+    django.setup()
+
+
+def execute(name, args):
+    """Run one task. Returns ``None`` or the formatted traceback."""
+    close_old_connections()
+    try:
+        import_string(name)(*args)
+    except Exception:
+        return traceback.format_exc()
+    finally:
+        close_old_connections()
+    return None
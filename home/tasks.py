@@ -0,0 +1,204 @@
+"""
+A small database-backed task queue; no broker needed.
+
+``enqueue('home.images.build_derivatives', 'Product', 42)`` inserts a
+``Task`` row, in the caller's transaction, so work is only queued if the
+change that caused it commits. ``manage.py runworker`` claims due tasks
+highest ``priority`` first (``SELECT ... FOR UPDATE SKIP LOCKED`` where the
+database supports it, so several workers can share the queue) and runs them
+in a process pool, off the web workers. A failed task is retried after an
+exponential backoff until ``max_attempts``, then marked failed with its
+traceback; everything is visible and retryable in the admin. While a task
+runs, its worker refreshes ``heartbeat_at`` every ``HEARTBEAT_INTERVAL``;
+a running task whose heartbeat is older than ``STALE_AFTER`` lost its
+worker and is queued again by the next worker to look, however long the
+task itself takes.
+
+Tasks invalidate cached pages (fragments, feeds, thumbnail pools), so the
+worker must share the web processes' cache: ``runworker`` refuses to start
+with a per-process ``LocMemCache`` (see ``cache_is_shared``).
+
+``enqueue(..., unique=True)`` is backed by a partial unique constraint on
+a hash of the name and arguments of queued tasks, so concurrent saves
+cannot queue the same work twice; once claimed, a task no longer blocks a
+new identical one.
+"""
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+from .task_runner import execute, init_process
+
+logger = logging.getLogger(__name__)
+
+RETRY_DELAY = 30  # seconds before the first retry; doubles on each attempt
+HEARTBEAT_INTERVAL = timedelta(seconds=30)
+STALE_AFTER = timedelta(minutes=5)  # a running task without a heartbeat this long lost its worker
+
+
+def unique_key(name, args):
+    return hashlib.sha256(json.dumps([name, list(args)], sort_keys=True).encode()).hexdigest()
+
+
+def enqueue(name, *args, priority=0, max_attempts=3, delay=0, unique=False):
+    """
+    Queue a call of the function at dotted path ``name`` with JSON-serialisable
+    ``args``. With ``unique``, an identical task that is still queued is reused.
+    """
+    key = unique_key(name, args) if unique else None
+    if unique:
+        existing = Task.objects.filter(unique_key=key, status=Task.QUEUED).first()
+        if existing is not None:
+            return existing
+    task = Task(
+        name=name,
+        args=list(args),
+        priority=priority,
+        max_attempts=max_attempts,
+        run_after=timezone.now() + timedelta(seconds=delay),
+        unique_key=key,
+    )
+    try:
+        with transaction.atomic():
+            task.save()
+    except IntegrityError:
+        # Another transaction queued it since the check above
+        existing = Task.objects.filter(unique_key=key, status=Task.QUEUED).first() if unique else None
+        if existing is None:
+            raise
+        return existing
+    return task
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due tasks as running for ``worker`` and return them."""
+    now = timezone.now()
+    with transaction.atomic():
+        due = Task.objects.filter(status=Task.QUEUED, run_after__lte=now).order_by('-priority', 'run_after', 'id')
+        if connection.features.has_select_for_update_skip_locked:
+            due = due.select_for_update(skip_locked=True)
+        tasks = list(due[:limit])
+        for task in tasks:
+            task.status = Task.RUNNING
+            task.attempts += 1
+            task.worker = worker
+            task.started_at = now
+            task.heartbeat_at = now
+            task.finished_at = None
+            task.unique_key = None  # new identical work may be queued while this runs
+        Task.objects.bulk_update(tasks, ['status', 'attempts', 'worker', 'started_at', 'heartbeat_at', 'finished_at', 'unique_key'])
+    return tasks
+
+
+def finish(task, error=None):
+    """Record the outcome of one run: done, queued again after a backoff, or failed."""
+    task.finished_at = timezone.now()
+    if error is None:
+        task.status = Task.DONE
+        task.last_error = ''
+    elif task.attempts < task.max_attempts:
+        task.status = Task.QUEUED
+        task.last_error = error
+        task.run_after = task.finished_at + timedelta(seconds=RETRY_DELAY * 2 ** (task.attempts - 1))
+    else:
+        task.status = Task.FAILED
+        task.last_error = error
+        logger.error("Task %s failed for good: %s", task, error.strip().splitlines()[-1])
+    task.save(update_fields=['status', 'last_error', 'run_after', 'finished_at'])
+
+
+def heartbeat(tasks, now=None):
+    """Record that the worker running ``tasks`` is still alive."""
+    Task.objects.filter(pk__in=[task.pk for task in tasks], status=Task.RUNNING).update(heartbeat_at=now or timezone.now())
+
+
+def requeue_stale(now=None):
+    """Put back tasks left running by a worker that stopped sending heartbeats. Returns how many."""
+    cutoff = (now or timezone.now()) - STALE_AFTER
+    silent = Q(heartbeat_at__lt=cutoff) | Q(heartbeat_at__isnull=True, started_at__lt=cutoff)
+    return Task.objects.filter(silent, status=Task.RUNNING).update(status=Task.QUEUED, worker='')
+
+
+def unclaim(tasks):
+    """Hand claimed tasks that never started back to the queue."""
+    Task.objects.filter(pk__in=[task.pk for task in tasks]).update(
+        status=Task.QUEUED, attempts=F('attempts') - 1, worker='', started_at=None,
+    )
+
+
+def retry(tasks):
+    """Queue finished or failed tasks to run again now (admin action)."""
+    return tasks.exclude(status=Task.RUNNING).update(
+        status=Task.QUEUED, attempts=0, run_after=timezone.now(), last_error='', finished_at=None,
+    )
+
+
+# ---------------------------
+# Worker
+# ---------------------------
+def cache_is_shared():
+    """Whether what tasks write to the default cache is seen by the web processes."""
+    return not isinstance(caches['default'], LocMemCache)
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def run_worker(processes=2, poll_interval=2.0, burst=False, stop=None):
+    """
+    Claim and run tasks until ``stop()`` returns true, or (``burst``) until
+    nothing is due. Pool processes are spawned fresh (see ``home.task_runner``),
+    so they never share the parent's database connection.
+    """
+    worker = worker_name()
+    requeue_stale()
+    last_beat = time.monotonic()
+    running = {}
+    broken = False
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=init_process) as pool:
+        while True:
+            if time.monotonic() - last_beat >= HEARTBEAT_INTERVAL.total_seconds():
+                heartbeat(running.values())
+                requeue_stale()  # also picks up after workers that died since this one started
+                last_beat = time.monotonic()
+            stopping = stop is not None and stop()
+            if not (stopping or broken) and len(running) < processes:
+                claimed = claim(worker, processes - len(running))
+                for index, task in enumerate(claimed):
+                    try:
+                        running[pool.submit(execute, task.name, task.args)] = task
+                    except BrokenProcessPool:
+                        broken = True
+                        unclaim(claimed[index:])
+                        break
+            if not running:
+                if broken:
+                    raise BrokenProcessPool("A pool process died; restart the worker.")
+                if stopping or burst:
+                    break
+                time.sleep(poll_interval)
+                continue
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                try:
+                    error = future.result()
+                except Exception as exc:  # the pool process itself died
+                    error = f"{type(exc).__name__}: {exc}"
+                finish(task, error)
@@ -1,18 +1,65 @@
 from django import template
-from home.models import DeliveryFeature
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.templatetags.static import static
+from django.utils.html import format_html, format_html_join
+from home.assets import BUNDLES
+from home.catalog import popular_items
+from home.delivery import features_for_page
+from home.images import DEFAULT_SIZES, derivative_url, has_derivatives, original_url, srcset
 
 register = template.Library()
 
 @register.inclusion_tag('partials/delivery_section.html', takes_context=False)
 def delivery_section(page_key='all'):
-    qs = DeliveryFeature.objects.filter(is_active=True).order_by('sort_order', 'id')
-    if not page_key or page_key == 'all':
-        return { 'features': list(qs) }
-    filtered = []
-    key = str(page_key).lower().strip()
-    for f in qs:
-        pages = (f.pages or '').lower()
-        tokens = [t.strip() for t in pages.split(',') if t.strip()]
-        if not tokens or 'all' in tokens or key in tokens:
-            filtered.append(f)
-    return { 'features': filtered }
+    return { 'features': features_for_page(page_key) }
+
+
+@register.inclusion_tag('popularItems.html')
+def popular_items_section():
+    return { 'productList': popular_items() }
+
+
+@register.simple_tag
+def picture(image, size='card', alt='', css_class='', sizes=None, loading='lazy'):
+    """
+    ``<picture>`` for an uploaded image: WebP and JPEG ``srcset`` over every
+    derivative width, with the ``size`` derivative as the plain ``src``.
+    Falls back to a plain ``<img>`` of the original until derivatives exist.
+    """
+    if not image:
+        return ''
+    if not has_derivatives(image):
+        return format_html('<img src="{}" alt="{}" class="{}" loading="{}">', original_url(image), alt, css_class, loading)
+    sizes = sizes or DEFAULT_SIZES[size]
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}" loading="{}"></picture>',
+        srcset(image, 'webp'), sizes,
+        derivative_url(image, size), srcset(image, 'jpg'), sizes, alt, css_class, loading,
+    )
+
+
+@register.simple_tag
+def image_url(image, size='zoom'):
+    """URL of one JPEG derivative (e.g. for lightbox links and video posters), or of the original."""
+    if not image:
+        return ''
+    return derivative_url(image, size) if has_derivatives(image) else original_url(image)
+
+
+BUNDLE_TAGS = {
+    '.css': '<link rel="stylesheet" href="{}">',
+    '.js': '<script src="{}"></script>',
+}
+
+
+@register.simple_tag
+def bundle(name):
+    """
+    ``<link>``/``<script>`` for an asset bundle (see ``home.assets``): the one
+    hashed file once ``build_assets`` has run, else each of its source files.
+    """
+    tag = BUNDLE_TAGS['.css' if name.endswith('.css') else '.js']
+    manifest = getattr(staticfiles_storage, 'manifest', dict)()
+    files = [name] if name in manifest else BUNDLES[name]
+    return format_html_join('\n', tag, ((static(path),) for path in files))
@@ -1,3 +1,693 @@
-from django.test import TestCase
+import io
+import os
+import shutil
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from PIL import Image
+
+from .catalog import popular_items
+from .delivery import features_for_page, remove_features_from_page, set_feature_pages
+from .images import generate_derivatives, srcset
+from .cart import MAX_COOKIE_LINES, DatabaseCartStorage
+from .models import Cart, CartItem, DeliveryFeature, FeaturedProduct, Order, OrderItem, Product, ProductVariant, Slider, StockLevel, StockReservation, Task
+from .order_pdf import FAILURE_TIMEOUT, build_history_pdf, pdf_storage
+from .orders import place_order
+from .serve import parse_range
+from .stock import OutOfStockError, release_expired_reservations
+from .suggest import SuggestIndex
+from .tasks import RETRY_DELAY, STALE_AFTER, claim, enqueue, finish, heartbeat, requeue_stale, retry, unique_key
+
+CHECKOUT_DATA = {
+    'country': 'inside_dhaka', 'first_name': 'Test', 'last_name': 'Buyer', 'address': 'Road 1',
+    'email': 'buyer@example.com', 'phone': '01700000000', 'order_notes': '',
+}
+
+
+def use_temp_media(testcase):
+    """Point MEDIA_ROOT and the private storage at scratch directories for the rest of ``testcase``."""
+    media_root, private_root = tempfile.mkdtemp(), tempfile.mkdtemp()
+    testcase.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    testcase.addCleanup(shutil.rmtree, private_root, ignore_errors=True)
+    private = {**settings.STORAGES['private'], 'OPTIONS': {'location': private_root}}
+    override = override_settings(MEDIA_ROOT=media_root, STORAGES={**settings.STORAGES, 'private': private})
+    override.enable()
+    testcase.addCleanup(override.disable)
+
+
+def make_shopper(username, product, quantity=1, volume_option='50 ml'):
+    user = get_user_model().objects.create(username=username)
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=product, quantity=quantity, volume_option=volume_option)
+    return user
+
+
+# ---------------------------
+# Stock reservations
+# ---------------------------
+class StockReservationTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Velvet Oud", price=1000)
+        self.stock = StockLevel.objects.create(product=self.product, volume_option='50 ml', on_hand=3)
+
+    def test_checkout_reserves_and_refuses_to_oversell(self):
+        order, _ = place_order(make_shopper('a', self.product, 2), CHECKOUT_DATA)
+        self.assertEqual(order.stock_reservations.get().quantity, 2)
+
+        late = make_shopper('b', self.product, 2)
+        with self.assertRaises(OutOfStockError):
+            place_order(late, CHECKOUT_DATA)
+        self.assertFalse(Order.objects.filter(user=late).exists())
+        self.assertEqual(CartItem.objects.filter(cart__user=late).count(), 1)
+
+        self.stock.refresh_from_db()
+        self.assertEqual((self.stock.on_hand, self.stock.reserved), (3, 2))
+
+    def test_untracked_volume_is_not_limited(self):
+        order, _ = place_order(make_shopper('a', self.product, 10, volume_option='30 ml'), CHECKOUT_DATA)
+        self.assertFalse(order.stock_reservations.exists())
+
+    def test_status_changes_settle_or_release(self):
+        shipped, _ = place_order(make_shopper('a', self.product, 2), CHECKOUT_DATA)
+        cancelled, _ = place_order(make_shopper('b', self.product, 1), CHECKOUT_DATA)
+
+        shipped.order_status = 'shipped'
+        shipped.save()
+        cancelled.order_status = 'cancelled'
+        cancelled.save()
+
+        self.stock.refresh_from_db()
+        self.assertEqual((self.stock.on_hand, self.stock.reserved), (1, 0))
+        self.assertEqual(shipped.stock_reservations.get().status, StockReservation.SETTLED)
+        self.assertEqual(cancelled.stock_reservations.get().status, StockReservation.RELEASED)
+
+    def test_deleting_an_order_takes_back_units_sold(self):
+        kept, _ = place_order(make_shopper('a', self.product, 1), CHECKOUT_DATA)
+        deleted, _ = place_order(make_shopper('b', self.product, 1), CHECKOUT_DATA)
+        cancelled, _ = place_order(make_shopper('c', self.product, 1), CHECKOUT_DATA)
+        cancelled.order_status = 'cancelled'
+        cancelled.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.units_sold, 2)
+
+        deleted.delete()
+        cancelled.delete()
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.units_sold, self.product.units_sold_30d), (1, 1))
+
+    def test_admin_cannot_set_on_hand_below_reserved(self):
+        place_order(make_shopper('a', self.product, 2), CHECKOUT_DATA)
+        admin_user = get_user_model().objects.create(username='staff', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+        response = self.client.post(reverse('admin:home_stocklevel_changelist'), {
+            'form-TOTAL_FORMS': 1, 'form-INITIAL_FORMS': 1,
+            'form-0-id': self.stock.pk, 'form-0-on_hand': 1, '_save': 'Save',
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'on hand cannot be lower')
+        self.stock.refresh_from_db()
+        self.assertEqual((self.stock.on_hand, self.stock.reserved), (3, 2))
+
+    def test_expired_reservations_release_stock_but_keep_the_order(self):
+        order, _ = place_order(make_shopper('a', self.product, 3), CHECKOUT_DATA)
+
+        self.assertEqual(release_expired_reservations(), 0)
+        self.assertEqual(release_expired_reservations(now=timezone.now() + timedelta(days=30)), 1)
+
+        order.refresh_from_db()
+        self.stock.refresh_from_db()
+        self.assertEqual(order.order_status, 'pending')
+        self.assertEqual((self.stock.on_hand, self.stock.reserved), (3, 0))
+        self.assertEqual(order.stock_reservations.get().status, StockReservation.EXPIRED)
+
+        # Someone else buys 2 meanwhile; shipping the late order must not eat their reservation
+        place_order(make_shopper('b', self.product, 2), CHECKOUT_DATA)
+        order.order_status = 'shipped'
+        order.save()
+        self.stock.refresh_from_db()
+        self.assertEqual((self.stock.on_hand, self.stock.reserved), (2, 2))
+        self.assertEqual(order.stock_reservations.get().status, StockReservation.SETTLED)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class ConcurrentCheckoutTests(TransactionTestCase):
+    """Fire parallel checkouts at one SKU and check nothing is oversold."""
+
+    SHOPPERS = 12
+    ON_HAND = 5
+
+    def test_parallel_checkouts_never_oversell(self):
+        product = Product.objects.create(name="Flash Sale Musk", price=500)
+        StockLevel.objects.create(product=product, volume_option='50 ml', on_hand=self.ON_HAND)
+        shoppers = [make_shopper(f'shopper{i}', product) for i in range(self.SHOPPERS)]
+
+        start = threading.Barrier(self.SHOPPERS)
+        placed, sold_out, errors = [], [], []
+
+        def checkout(user):
+            try:
+                start.wait()
+                placed.append(place_order(user, CHECKOUT_DATA)[0].pk)
+            except OutOfStockError:
+                sold_out.append(user.pk)
+            except Exception as exc:  # e.g. "database is locked" on SQLite
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(user,)) for user in shoppers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stock = StockLevel.objects.get(product=product)
+        self.assertLessEqual(stock.reserved, stock.on_hand)
+        self.assertEqual(stock.reserved, len(placed))
+        self.assertEqual(Order.objects.filter(items__product=product).count(), len(placed))
+        if connection.vendor == 'postgresql':
+            # Row locks queue every checkout, so exactly the stock on hand sells
+            self.assertEqual(errors, [])
+            self.assertEqual(len(placed), self.ON_HAND)
+            self.assertEqual(len(sold_out), self.SHOPPERS - self.ON_HAND)
+
+
+# ---------------------------
+# Order export
+# ---------------------------
+class OrderExportAdminTests(TestCase):
+    def setUp(self):
+        staff = get_user_model().objects.create_superuser('staff', 'staff@example.com', 'pass-1234')
+        self.client.force_login(staff)
+        self.order = Order.objects.create(user=staff, total_price=100, **CHECKOUT_DATA)
+
+    def export(self, action):
+        return self.client.post(reverse('admin:home_order_changelist'), {
+            'action': action, '_selected_action': [self.order.pk],
+        }, follow=True)
+
+    def test_excel_export(self):
+        response = self.export('export_xlsx')
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+
+    def test_excel_export_without_openpyxl_is_reported(self):
+        with mock.patch.dict(sys.modules, {'openpyxl': None}):
+            response = self.export('export_xlsx')
+        self.assertContains(response, "Excel export needs the &#x27;openpyxl&#x27; package")
+
+
+# ---------------------------
+# Cart
+# ---------------------------
+class CartSelectionTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Velvet Oud", price=1000)
+
+    def test_unknown_volume_falls_back_to_default(self):
+        user = get_user_model().objects.create(username='shopper')
+        self.client.force_login(user)
+        self.client.post(reverse('add_to_cart', args=[self.product.pk]), {'volume_option': 'x' * 40, 'quantity': 2})
+        self.assertEqual(list(CartItem.objects.values_list('volume_option', 'quantity')), [('50 ml', 2)])
+
+    def test_full_cookie_cart_tells_the_shopper(self):
+        products = [Product(name=f"Scent {i}", price=100) for i in range(MAX_COOKIE_LINES + 1)]
+        Product.objects.bulk_create(products)
+        for product in Product.objects.order_by('id')[:MAX_COOKIE_LINES]:
+            self.client.post(reverse('add_to_cart', args=[product.pk]))
+        last = Product.objects.order_by('-id').first()
+        response = self.client.post(reverse('add_to_cart', args=[last.pk]), follow=True, HTTP_REFERER=reverse('view_cart'))
+        self.assertContains(response, 'different items')
+        self.assertEqual(len(response.context['items']), MAX_COOKIE_LINES)
+
+    def test_any_login_merges_the_guest_cart(self):
+        get_user_model().objects.create_superuser('staff', 'staff@example.com', 'pass-1234')
+        self.client.post(reverse('add_to_cart', args=[self.product.pk]), {'volume_option': '30 ml', 'quantity': 2})
+
+        response = self.client.post(reverse('admin:login'), {'username': 'staff', 'password': 'pass-1234'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(CartItem.objects.values_list('cart__user__username', 'volume_option', 'quantity')), [('staff', '30 ml', 2)])
+        self.assertEqual(response.cookies['cart'].value, '')
+
+
+class CartPricingTests(TestCase):
+    def setUp(self):
+        self.product = Product.objects.create(name="Velvet Oud", price=1000, sale_price=800)
+        ProductVariant.objects.create(product=self.product, volume_option='30 ml', price=600, sale_price=500)
+        self.user = make_shopper('shopper', self.product, quantity=2)
+        CartItem.objects.create(cart=self.user.cart, product=self.product, quantity=1, volume_option='30 ml')
+        self.client.force_login(self.user)
+
+    def lines(self, response):
+        return [(line.volume_option, line.unit_price, line.total_price) for line in response.context['items']]
+
+    def test_lines_are_priced_per_volume(self):
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(self.lines(response), [('50 ml', Decimal('1000'), Decimal('2000')), ('30 ml', Decimal('600'), Decimal('600'))])
+        self.assertEqual(response.context['total_price'], Decimal('2600'))
+        self.assertContains(response, '<td class="product-price">600.00 ৳</td>')
+
+    def test_sale_prices_apply_while_on_sale(self):
+        self.product.is_sale = True
+        self.product.save()
+        response = self.client.get(reverse('view_cart'))
+        self.assertEqual(self.lines(response), [('50 ml', Decimal('800'), Decimal('1600')), ('30 ml', Decimal('500'), Decimal('500'))])
+        self.assertEqual(response.context['total_price'], Decimal('2100'))
+        self.assertContains(response, '<td class="product-price">800.00 ৳</td>')
+
+        order, _ = place_order(self.user, CHECKOUT_DATA)
+        self.assertEqual(list(order.items.order_by('id').values_list('price', flat=True)), [Decimal('800'), Decimal('500')])
+        self.assertEqual(order.total_price, Decimal('2100') + order.delivery_charge)
+
+
+class CartCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Velvet Oud", price=1000)
+        self.user = make_shopper('shopper', self.product, quantity=2)
+        self.client.force_login(self.user)
+
+    def badge(self):
+        return self.client.get(reverse('about')).context['cart_items_count']
+
+    def test_warm_count_runs_no_queries(self):
+        self.assertEqual(DatabaseCartStorage(self.user).count(), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(DatabaseCartStorage(self.user).count(), 2)
+
+    def test_cart_writes_refresh_the_badge(self):
+        self.assertEqual(self.badge(), 2)
+        self.client.post(reverse('add_to_cart', args=[self.product.pk]), {'quantity': 3})
+        self.assertEqual(self.badge(), 5)
+
+        item = CartItem.objects.get()
+        self.client.post(reverse('ajax_add_to_cart', args=[item.pk]))
+        self.assertEqual(self.badge(), 6)
+        self.client.post(reverse('ajax_remove_from_cart', args=[item.pk]))
+        self.client.post(reverse('remove_from_cart', args=[item.pk]))
+        self.assertEqual(self.badge(), 4)
+
+
+# ---------------------------
+# Homepage caches
+# ---------------------------
+class HomepageFragmentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(name="Velvet Oud", price=1000, image1='p/x.jpg')
+        self.featured = FeaturedProduct.objects.create(product=self.product)
+        self.slide = Slider.objects.create(image='slider_images/a.jpg', link_url='https://example.com/spring')
+        self.client.get('/')
+
+    def test_warm_homepage_runs_no_queries(self):
+        with self.assertNumQueries(0):
+            self.client.get('/')
+
+    def test_saving_a_slide_refreshes_the_slider(self):
+        self.slide.link_url = 'https://example.com/summer'
+        self.slide.save()
+        response = self.client.get('/')
+        self.assertContains(response, 'example.com/summer')
+        self.assertNotContains(response, 'example.com/spring')
+
+    def test_renaming_or_unfeaturing_a_product_refreshes_featured(self):
+        self.product.name = "Amber Oud"
+        self.product.save()
+        self.assertContains(self.client.get('/'), 'Amber Oud')
+
+        self.featured.delete()
+        self.product.delete()
+        self.assertNotContains(self.client.get('/'), 'Amber Oud')
+
+
+class PopularItemsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_only_flagged_products_best_selling_first(self):
+        Product.objects.create(name="Newest unflagged", price=100)
+        quiet = Product.objects.create(name="Quiet", price=100, is_popular=True)
+        best = Product.objects.create(name="Best", price=100, is_popular=True, units_sold=9)
+        newer = Product.objects.create(name="Newer quiet", price=100, is_popular=True)
+        self.assertEqual(popular_items(), [best, newer, quiet])
+
+    def test_cached_feed_runs_no_queries_until_a_product_changes(self):
+        product = Product.objects.create(name="Velvet Oud", price=100, is_popular=True)
+        popular_items()
+        with self.assertNumQueries(0):
+            self.assertEqual(popular_items(), [product])
+
+        product.is_popular = False
+        product.save()
+        self.assertEqual(popular_items(), [])
+
+
+# ---------------------------
+# Delivery features
+# ---------------------------
+class DeliveryFeatureTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.feature = DeliveryFeature.objects.create(title="Free delivery")
+        set_feature_pages(self.feature, ['about'])
+
+    def titles(self, page_key):
+        return [feature.title for feature in features_for_page(page_key)]
+
+    def test_warm_lookup_runs_no_queries(self):
+        self.titles('about')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.titles('about'), ["Free delivery"])
+            self.assertEqual(self.titles('shop'), [])
+            self.assertEqual(self.titles('unknown'), [])
+
+    def test_feature_and_target_changes_refresh_the_lookup(self):
+        self.titles('about')
+        self.feature.title = "Cash on delivery"
+        self.feature.save()
+        self.assertEqual(self.titles('about'), ["Cash on delivery"])
+
+        set_feature_pages(self.feature, ['shop'])
+        self.assertEqual((self.titles('about'), self.titles('shop')), ([], ["Cash on delivery"]))
+
+        self.feature.delete()
+        self.assertEqual(self.titles('shop'), [])
+
+    def test_removing_a_page_keeps_a_features_last_target(self):
+        other = DeliveryFeature.objects.create(title="Easy returns")
+        set_feature_pages(other, ['about', 'shop'])
+        features = DeliveryFeature.objects.all()
+
+        self.assertEqual(remove_features_from_page(features, 'about'), (1, 1))
+        self.assertEqual(self.titles('about'), ["Free delivery"])
+        self.assertEqual(other.page_keys, ['shop'])
+
+
+# ---------------------------
+# Live search suggestions
+# ---------------------------
+class SuggestTests(TestCase):
+    def setUp(self):
+        Product.objects.create(name="Velvet Oud", price=1000, product_type='Roll Ons', product_gender='Unisex', details='<p>Smoky leather</p>')
+        Product.objects.create(name="Rose Water", price=800, product_type='Spray perfume', product_gender='Female', top_note='Bergamot')
+
+    def test_index_and_database_match_the_same_columns(self):
+        index = SuggestIndex()
+        index.rebuild()
+        for query in ('velvet', 'roll', 'unisex', 'leather', 'bergamot'):
+            from_index = [item['name'] for item in index.search(query)]
+            from_db = [item['name'] for item in self.client.get(reverse('search_suggest'), {'q': query}).json()['results']]
+            self.assertEqual(from_index, from_db, query)
+            self.assertEqual(len(from_index), 1, query)
+
+
+# ---------------------------
+# Profile order history
+# ---------------------------
+class ProfileOrderHistoryTests(TestCase):
+    """The profile page's query count must not grow with orders or items."""
+
+    # session, user, profile, order count, orders page, their items + products
+    QUERIES = 6
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create(username='regular')
+        self.client.force_login(self.user)
+        self.products = [Product.objects.create(name=f"Scent {i}", price=100, image1='p/x.jpg') for i in range(3)]
+
+    def add_orders(self, count, items_per_order):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total_price=100, **CHECKOUT_DATA)
+            OrderItem.objects.bulk_create([
+                OrderItem(order=order, product=self.products[i % len(self.products)], quantity=1, price=100)
+                for i in range(items_per_order)
+            ])
+
+    def test_query_count_is_constant(self):
+        self.add_orders(1, 1)
+        self.client.get(reverse('profile'))  # warm the cart badge and delivery caches
+        with self.assertNumQueries(self.QUERIES):
+            self.client.get(reverse('profile'))
+
+        self.add_orders(30, 5)
+        with self.assertNumQueries(self.QUERIES):
+            response = self.client.get(reverse('profile'), {'page': 2})
+        self.assertEqual(response.context['orders'].paginator.count, 31)
+        self.assertEqual(len(response.context['orders']), 10)
+
+
+class OrderHistoryPDFTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        self.user = get_user_model().objects.create(username='regular')
+        self.client.force_login(self.user)
+        Order.objects.create(user=self.user, total_price=100, **CHECKOUT_DATA)
+
+    def run_build(self, **render):
+        """Run the queued build as the worker would: claim, call, record the outcome."""
+        task, = claim('worker', 1)
+        error = None
+        with mock.patch('home.order_pdf.render_history', **render):
+            try:
+                build_history_pdf(*task.args)
+            except Exception as exc:
+                error = f"Traceback\n{exc!r}"
+        finish(task, error)
+        return task
+
+    def test_built_by_the_worker_into_private_storage(self):
+        self.assertEqual(self.client.get(reverse('profile_orders_pdf')).status_code, 202)
+        self.assertEqual(self.client.get(reverse('profile_orders_pdf')).status_code, 202)
+        task = Task.objects.get()
+        self.assertEqual(task.name, 'home.order_pdf.build_history_pdf')
+
+        self.run_build(return_value=b'%PDF-1.4 test')
+        response = self.client.get(reverse('profile_orders_pdf'))
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4 test')
+
+        path = task.args[1]
+        self.assertTrue(pdf_storage().exists(path))
+        self.assertFalse(default_storage.exists(path))
+        self.assertEqual(self.client.get(f"{settings.MEDIA_URL}{path}").status_code, 404)
+
+    def test_failed_build_is_reported_instead_of_polled(self):
+        self.client.get(reverse('profile_orders_pdf'))
+        with self.assertLogs('home.tasks', 'ERROR'):
+            task = self.run_build(side_effect=RuntimeError('boom'))
+        response = self.client.get(reverse('profile_orders_pdf'))
+        self.assertEqual(response.status_code, 503)
+        self.assertNotIn('Refresh', response)
+
+        # Once the failure is old enough, the next download queues a fresh build
+        Task.objects.filter(pk=task.pk).update(finished_at=timezone.now() - FAILURE_TIMEOUT)
+        self.assertEqual(self.client.get(reverse('profile_orders_pdf')).status_code, 202)
+        self.assertEqual(Task.objects.filter(status=Task.QUEUED).count(), 1)
+
+
+# ---------------------------
+# Task queue
+# ---------------------------
+class TaskQueueTests(TestCase):
+    def test_unique_enqueue_reuses_the_queued_task(self):
+        first = enqueue('home.images.build_derivatives', 'Slider', 1, unique=True)
+        self.assertEqual(enqueue('home.images.build_derivatives', 'Slider', 1, unique=True).pk, first.pk)
+        self.assertNotEqual(enqueue('home.images.build_derivatives', 'Slider', 2, unique=True).pk, first.pk)
+
+        claim('test', 10)
+        # Running work does not block new identical work
+        self.assertNotEqual(enqueue('home.images.build_derivatives', 'Slider', 1, unique=True).pk, first.pk)
+
+    def test_database_rejects_a_duplicate_queued_task(self):
+        key = unique_key('home.images.build_derivatives', ['Slider', 1])
+        Task.objects.create(name='home.images.build_derivatives', args=['Slider', 1], unique_key=key)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Task.objects.create(name='home.images.build_derivatives', args=['Slider', 1], unique_key=key)
+
+    def test_claim_takes_due_tasks_by_priority(self):
+        low = enqueue('a.low')
+        high = enqueue('a.high', priority=5)
+        enqueue('a.later', delay=60)
+
+        claimed = claim('worker-1', 10)
+        self.assertEqual([task.pk for task in claimed], [high.pk, low.pk])
+        high.refresh_from_db()
+        self.assertEqual((high.status, high.attempts, high.worker), (Task.RUNNING, 1, 'worker-1'))
+        self.assertEqual(claim('worker-2', 10), [])
+
+    def test_finish_retries_with_backoff_then_fails(self):
+        enqueue('a.flaky', max_attempts=2)
+        task, = claim('worker', 1)
+        finish(task, "Traceback\nValueError: boom")
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.last_error), (Task.QUEUED, "Traceback\nValueError: boom"))
+        self.assertEqual(task.run_after, task.finished_at + timedelta(seconds=RETRY_DELAY))
+
+        Task.objects.filter(pk=task.pk).update(run_after=timezone.now())
+        task, = claim('worker', 1)
+        with self.assertLogs('home.tasks', 'ERROR'):
+            finish(task, "Traceback\nValueError: boom")
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts), (Task.FAILED, 2))
+
+        self.assertEqual(retry(Task.objects.all()), 1)
+        task.refresh_from_db()
+        self.assertEqual((task.status, task.attempts, task.last_error), (Task.QUEUED, 0, ''))
+
+    def test_finish_marks_success_done(self):
+        enqueue('a.ok')
+        task, = claim('worker', 1)
+        finish(task)
+        task.refresh_from_db()
+        self.assertEqual(task.status, Task.DONE)
+
+    def test_requeue_only_tasks_without_a_recent_heartbeat(self):
+        enqueue('a.lost')
+        enqueue('a.long_transcode')
+        lost, busy = claim('worker', 2)
+        silent_since = timezone.now() - STALE_AFTER - timedelta(minutes=1)
+        Task.objects.update(started_at=timezone.now() - timedelta(hours=3), heartbeat_at=silent_since)
+        heartbeat([busy])
+
+        self.assertEqual(requeue_stale(), 1)
+        self.assertEqual(Task.objects.get(pk=lost.pk).status, Task.QUEUED)
+        self.assertEqual(Task.objects.get(pk=busy.pk).status, Task.RUNNING)
+
+
+# ---------------------------
+# Image derivatives
+# ---------------------------
+def png_upload(name, width, height):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 80, 80)).save(buffer, 'PNG')
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        use_temp_media(self)
+
+    def test_worker_refreshes_pages_cached_by_web_processes(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': cache_dir}}
+        with override_settings(CACHES=shared):
+            Slider.objects.create(image=png_upload('slider_images/s.png', 1800, 600))
+            self.assertContains(self.client.get('/'), 'src="/media/slider_images/s.png"')
+
+            # The task queued by the save, run the way runworker runs it
+            task, = claim('worker', 1)
+            self.assertEqual(task.name, 'home.images.build_derivatives')
+            import_string(task.name)(*task.args)
+            finish(task)
+
+            # A web process with its own connection to the shared cache
+            self.assertIsNone(caches.create_connection('default').get(make_template_fragment_key('home_slider')))
+            response = self.client.get('/')
+            self.assertContains(response, '/media/derivatives/slider_images/s-zoom.jpg')
+            self.assertNotContains(response, 'src="/media/slider_images/s.png"')
+
+    def test_worker_refuses_a_process_local_cache(self):
+        with self.assertRaisesMessage(CommandError, 'REDIS_URL or CACHE_DIR'):
+            call_command('runworker', '--burst')
+
+    def test_srcset_lists_only_rendered_widths(self):
+        small = png_upload('p/small.png', 300, 200)
+        generate_derivatives(small)
+        self.assertEqual(
+            srcset(small, 'jpg'),
+            '/media/derivatives/p/small-thumb.jpg 120w, /media/derivatives/p/small-card.jpg 300w',
+        )
+        cache.clear()  # the same widths read back from storage
+        self.assertIn('small-card.webp 300w', srcset(small, 'webp'))
+        self.assertNotIn('1600w', srcset(small, 'webp'))
+
+
+# ---------------------------
+# Media and static file serving
+# ---------------------------
+class ParseRangeTests(TestCase):
+    def test_ranges(self):
+        cases = [
+            ('bytes=0-9', 100, (0, 9)),
+            ('bytes=90-', 100, (90, 99)),
+            ('bytes=90-500', 100, (90, 99)),
+            ('bytes=-10', 100, (90, 99)),
+            ('bytes=-500', 100, (0, 99)),
+            ('bytes=100-', 100, False),
+            ('bytes=9-3', 100, False),
+            ('bytes=-0', 100, False),
+            ('bytes=-5', 0, False),
+            ('bytes=0-', 0, False),
+            ('bytes=0-1,4-5', 100, None),
+            ('items=0-1', 100, None),
+            ('bytes=-', 100, None),
+            (None, 100, None),
+        ]
+        for header, size, expected in cases:
+            self.assertEqual(parse_range(header, size), expected, header)
+
+
+class ServeMediaTests(TestCase):
+    def setUp(self):
+        use_temp_media(self)
+        self.name = default_storage.save('clips/clip.mp4', ContentFile(bytes(range(256)) * 4))
+        self.url = f"/media/{self.name}"
+
+    def test_full_and_ranged_responses(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(len(b''.join(response.streaming_content)), 1024)
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_empty_file_suffix_range_is_unsatisfiable(self):
+        name = default_storage.save('clips/empty.mp4', ContentFile(b''))
+        response = self.client.get(f"/media/{name}", HTTP_RANGE='bytes=-5')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # A stale If-Range validator gets the whole (changed) file instead of a slice
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_paths_outside_the_root_are_not_found(self):
+        media_root = default_storage.location
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(media_root), suffix='.txt') as secret:
+            outside = os.path.basename(secret.name)
+            for path in (f'../{outside}', f'clips/../../{outside}', f'%2e%2e/{outside}', f'/{secret.name}', 'clips/'):
+                self.assertEqual(self.client.get(f'/media/{path}').status_code, 404, path)
@@ -0,0 +1,80 @@
+"""
+Random category thumbnails for the homepage without ``ORDER BY RANDOM()``.
+
+A small pool of ``(id, image1)`` pairs is kept per (gender, kind) bucket in
+the cache. The homepage picks from the pools in Python; the pools are
+rebuilt with a single query after a product changes or when they expire,
+which also rotates which products are eligible.
+"""
+import random
+
+from django.core.cache import cache
+
+from .models import Product
+
+POOLS_CACHE_KEY = 'home:thumbnail-pools'
+POOLS_TIMEOUT = 60 * 60
+POOL_SIZE = 24
+
+GENDERS = ('Male', 'Female', 'Unisex')
+
+
+def _kinds(product_type):
+    kinds = ['any']
+    if 'roll' in (product_type or '').lower():
+        kinds.append('roll')
+    return kinds
+
+
+def build_pools():
+    candidates = {}
+    rows = (
+        Product.objects.filter(product_gender__in=GENDERS, image1__isnull=False)
+        .exclude(image1='')
+        .values_list('id', 'product_gender', 'product_type', 'image1')
+    )
+    for pk, gender, product_type, image in rows.iterator(chunk_size=2000):
+        for kind in _kinds(product_type):
+            candidates.setdefault((gender, kind), []).append((pk, image))
+
+    pools = {}
+    for bucket, entries in candidates.items():
+        pools[bucket] = random.sample(entries, min(POOL_SIZE, len(entries)))
+    return pools
+
+
+def get_pools():
+    pools = cache.get(POOLS_CACHE_KEY)
+    if pools is None:
+        pools = build_pools()
+        cache.set(POOLS_CACHE_KEY, pools, POOLS_TIMEOUT)
+    return pools
+
+
+def invalidate_pools():
+    cache.delete(POOLS_CACHE_KEY)
+
+
+def category_samples():
+    """
+    Template context for the six category cards on the homepage.
+
+    Each value is an unsaved-looking ``Product`` carrying just ``id`` and
+    ``image1`` (all the template reads), or ``None`` if the bucket is empty.
+    Roll-on cards fall back to the gender's general sample.
+    """
+    pools = get_pools()
+
+    def pick(gender, kind):
+        pool = pools.get((gender, kind))
+        if not pool:
+            return None
+        pk, image = random.choice(pool)
+        return Product(id=pk, image1=image)
+
+    samples = {}
+    for gender in GENDERS:
+        key = gender.lower()
+        samples[f'{key}_sample'] = pick(gender, 'any')
+        samples[f'{key}_roll_sample'] = pick(gender, 'roll') or samples[f'{key}_sample']
+    return samples
@@ -2,7 +2,6 @@ from django.contrib import admin
 from django.urls import path
 
 from django.conf import settings
-from django.conf.urls.static import static
 
 from django.contrib.auth import views as auth_views
 from zenko import settings
@@ -47,6 +46,3 @@ urlpatterns = [
     path('profile/orders.pdf', views.profile_orders_pdf, name='profile_orders_pdf'),
    
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -0,0 +1,112 @@
+"""
+Web renditions of product videos.
+
+``Product.video`` keeps the upload as-is (often a tens-of-megabytes phone
+clip). ``process_product_video`` runs ffmpeg over it to write a size-capped
+H.264 MP4 and VP9 WebM plus a JPEG poster frame, and records them on the
+product. It is queued for the worker when a new video is saved (see
+``home.tasks``) and can be run directly with ``manage.py process_videos``.
+The product page serves the renditions once ``Product.video_ready``.
+
+Renditions are capped at ``MAX_SIDE`` pixels on the longer side,
+``MAX_SECONDS`` long and ``VIDEO_MAXRATE``, so even the largest is about
+``MAX_SECONDS * VIDEO_MAXRATE`` (~20 MB).
+"""
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.conf import settings
+from django.core.files import File
+
+from .models import Product
+
+MAX_SIDE = 1280
+MAX_SECONDS = 120
+VIDEO_MAXRATE = '1200k'
+FFMPEG_TIMEOUT = 60 * 15
+
+SCALE = (
+    f"scale=w='min(iw,{MAX_SIDE})':h='min(ih,{MAX_SIDE})':force_original_aspect_ratio=decrease,"
+    "scale=trunc(iw/2)*2:trunc(ih/2)*2"
+)
+
+# field -> (extension, ffmpeg output options)
+RENDITIONS = {
+    'video_mp4': ('mp4', [
+        '-t', str(MAX_SECONDS), '-vf', SCALE,
+        '-c:v', 'libx264', '-preset', 'medium', '-crf', '26', '-maxrate', VIDEO_MAXRATE, '-bufsize', '2400k',
+        '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-b:a', '96k', '-ac', '2',
+        '-movflags', '+faststart',
+    ]),
+    'video_webm': ('webm', [
+        '-t', str(MAX_SECONDS), '-vf', SCALE,
+        '-c:v', 'libvpx-vp9', '-crf', '34', '-b:v', VIDEO_MAXRATE, '-row-mt', '1', '-deadline', 'good', '-cpu-used', '4',
+        '-c:a', 'libopus', '-b:a', '64k', '-ac', '2',
+    ]),
+    'video_poster': ('jpg', [
+        '-vf', f"thumbnail,{SCALE}", '-frames:v', '1', '-q:v', '3',
+    ]),
+}
+
+
+class VideoProcessingError(Exception):
+    pass
+
+
+def ffmpeg_binary():
+    binary = shutil.which(getattr(settings, 'FFMPEG_BINARY', 'ffmpeg'))
+    if binary is None:
+        raise VideoProcessingError("ffmpeg was not found; install it or set FFMPEG_BINARY.")
+    return binary
+
+
+def needs_processing(product):
+    return bool(product.video) and product.video_source != product.video.name
+
+
+def _ffmpeg(source, options, target):
+    command = [ffmpeg_binary(), '-y', '-hide_banner', '-loglevel', 'error', '-i', source, *options, target]
+    try:
+        subprocess.run(command, check=True, capture_output=True, timeout=FFMPEG_TIMEOUT)
+    except subprocess.CalledProcessError as exc:
+        raise VideoProcessingError(exc.stderr.decode(errors='replace').strip()[-2000:] or f"ffmpeg exited with {exc.returncode}")
+    except subprocess.TimeoutExpired:
+        raise VideoProcessingError(f"ffmpeg took longer than {FFMPEG_TIMEOUT}s")
+
+
+def process_product_video(pk, force=False):
+    """
+    Task: render the web renditions and poster of product ``pk``'s video.
+    Returns False when there was nothing to do.
+    """
+    product = Product.objects.filter(pk=pk).first()
+    if product is None or not product.video or not (force or needs_processing(product)):
+        return False
+
+    source_name = product.video.name
+    stem = os.path.splitext(os.path.basename(source_name))[0]
+    previous = [getattr(product, field).name for field in RENDITIONS]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        source = os.path.join(workdir, 'source' + os.path.splitext(source_name)[1])
+        with product.video.open('rb') as upload, open(source, 'wb') as local:
+            shutil.copyfileobj(upload, local)
+
+        for field, (extension, options) in RENDITIONS.items():
+            target = os.path.join(workdir, f"{field}.{extension}")
+            _ffmpeg(source, options, target)
+            with open(target, 'rb') as rendered:
+                getattr(product, field).save(f"{stem}.{extension}", File(rendered), save=False)
+
+    product.video_source = source_name
+    # Only our columns: the product may have been edited while ffmpeg ran
+    product.save(update_fields=[*RENDITIONS, 'video_source'])
+
+    storage = product.video.storage
+    for name in previous:
+        if name and name not in {getattr(product, field).name for field in RENDITIONS}:
+            storage.delete(name)
+    return True
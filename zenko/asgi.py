@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'zenko.settings')
 
 application = get_asgi_application()
+
+# Build the live search index in the background as soon as the server starts
+from home.suggest import suggest_index  # noqa: E402
+
+suggest_index.warm()
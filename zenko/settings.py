@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 
     # Third-party
     'django_ckeditor_5',
@@ -74,6 +75,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'home.cart.CartCookieMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'allauth.account.middleware.AccountMiddleware',
@@ -96,6 +98,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'home.context_processors.cart',
             ],
         },
     },
@@ -114,6 +117,31 @@ DATABASES = {
     }
 }
 
+# Cache: per-process local memory in dev/tests. Set REDIS_URL to share it between
+# workers in production, or CACHE_DIR for a file cache when Redis isn't available.
+# manage.py runworker needs one of them: its tasks invalidate pages the web processes cache.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+elif os.getenv('CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('CACHE_DIR'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'zenko',
+        }
+    }
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',},
@@ -134,7 +162,27 @@ STATICFILES_DIRS = [
     os.path.join(BASE_DIR, 'static'),
 ]
 STATIC_ROOT = os.path.join(os.path.dirname(BASE_DIR), 'staticfiles')
+
+# manage.py build_assets writes hashed, compressed CSS/JS bundles here (home/assets.py)
+ASSET_BUILD_DIR = os.path.join(BASE_DIR, 'build', 'static')
+STATICFILES_FINDERS = [
+    'django.contrib.staticfiles.finders.FileSystemFinder',
+    'django.contrib.staticfiles.finders.AppDirectoriesFinder',
+    'home.assets.AssetFinder',
+]
 MEDIA_ROOT = os.path.join(os.path.dirname(BASE_DIR), 'staticfiles/media')
+# Files only views may hand out (order-history PDFs); kept outside MEDIA_ROOT so /media/ never serves them
+PRIVATE_ROOT = os.getenv('PRIVATE_ROOT', os.path.join(os.path.dirname(BASE_DIR), 'private'))
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'home.assets.AssetStorage'},
+    'private': {'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': PRIVATE_ROOT}},
+}
+
+# Serve /static/ and /media/ from Django (home/serve.py) when no nginx/CDN does.
+SERVE_FILES = os.getenv('SERVE_FILES', 'true').lower() in ('1', 'true', 'yes')
+MEDIA_CACHE_SECONDS = 60 * 60
+STATIC_CACHE_SECONDS = 60 * 60
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -146,6 +194,19 @@ TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID', 'your_account_sid_here')
 TWILIO_AUTH_TOKEN = os.getenv('TWILIO_AUTH_TOKEN', 'your_auth_token_here')
 TWILIO_PHONE_NUMBER = os.getenv('TWILIO_PHONE_NUMBER', '+1234567890')
 
+# Product search backend (see home/search.py). None picks PostgreSQL full-text
+# search on PostgreSQL and a plain icontains scan elsewhere (SQLite dev).
+SEARCH_BACKEND = None
+
+# Most products in the "Popular Items" carousel (home, shop and category pages); only is_popular ones are shown
+POPULAR_ITEMS_LIMIT = 12
+
+# Hours a pending order holds its stock before release_expired_reservations gives it back
+STOCK_RESERVATION_HOURS = 48
+
+# Used by home/video.py to transcode product videos (runworker / process_videos)
+FFMPEG_BINARY = os.getenv('FFMPEG_BINARY', 'ffmpeg')
+
 # For testing, you can disable actual SMS sending
 SMS_TESTING_MODE = True  # Set to False in production
 
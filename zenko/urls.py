@@ -15,15 +15,15 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path,include
+from django.urls import path, re_path, include
 
 from django.conf import settings
-from django.conf.urls.static import static
 
 from django.contrib.auth import views as auth_views
 from zenko import settings
 
 from home import views
+from home.serve import serve_media, serve_static
 from cart import views
 
 
@@ -47,6 +47,9 @@ urlpatterns = [
     
     
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+if settings.SERVE_FILES:
+    # Fallback file server (ranges, ETag/304) for deployments without nginx or a CDN
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.STATIC_URL.lstrip('/'), serve_static),
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media),
+    ]